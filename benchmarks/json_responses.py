@@ -0,0 +1,72 @@
+"""
+Микробенчмарк сериализации JSON-ответов.
+
+Сравнивает для страницы заказов (как у GET /orders):
+- jsonable_encoder + JSONResponse - прежний путь FastAPI для всех эндпоинтов;
+- jsonable_encoder + ORJSONResponse - класс по умолчанию без явного возврата ответа;
+- ORJSONResponse напрямую - эндпоинты без response_model, возвращающие ответ явно;
+- TypeAdapter.dump_json - путь FastAPI для эндпоинтов с response_model.
+
+Запуск: python -m benchmarks.json_responses [--items 100] [--number 2000]
+"""
+import argparse
+import timeit
+import uuid
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from src.tap_bank.schemas import OrderPage
+from src.utils.responses import ORJSONResponse
+
+
+def make_page(items: int) -> dict:
+    return {
+        'items': [
+            {
+                'id': uuid.uuid4(),
+                'amount': 100.5,
+                'status': 'submitted',
+                'requisites': {'id': f'up-{index}', 'card': '4111111111111111', 'bank': 'sber'},
+                'error': None,
+                'created_at': datetime.utcnow(),
+            }
+            for index in range(items)
+        ],
+        'next_cursor': 'eyJpZCI6ICIxIn0=',
+    }
+
+
+def bench(items: int, number: int) -> dict:
+    page = make_page(items)
+    adapter = TypeAdapter(OrderPage)
+    model = adapter.validate_python(page)
+
+    def per_call(func) -> float:
+        return timeit.timeit(func, number=number) / number * 1_000_000
+
+    return {
+        'jsonable+json': per_call(lambda: JSONResponse(jsonable_encoder(page))),
+        'jsonable+orjson': per_call(lambda: ORJSONResponse(jsonable_encoder(page))),
+        'orjson': per_call(lambda: ORJSONResponse(page)),
+        'pydantic': per_call(lambda: adapter.dump_json(model)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=100)
+    parser.add_argument('--number', type=int, default=2000)
+    args = parser.parse_args()
+
+    columns = ('jsonable+json', 'jsonable+orjson', 'orjson', 'pydantic')
+    print(f'{"items":<8}' + ''.join(f'{column + " us":>20}' for column in columns))
+    for items in (1, 20, args.items):
+        result = bench(items, args.number)
+        print(f'{items:<8}' + ''.join(f'{result[column]:>20.1f}' for column in columns))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Микробенчмарк подписи и проверки JWT для алгоритмов, поддерживаемых TokenService.
+
+Сравнивает RS256, ES256 и EdDSA, а также передачу PEM-строки (ключ парсится на каждый вызов)
+с передачей заранее разобранного объекта ключа (как делает get_jwt_keys).
+
+Запуск: python -m benchmarks.jwt_algorithms [--number 2000]
+"""
+import argparse
+import timeit
+from datetime import datetime, timedelta
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+
+def generate_keys(algorithm: str):
+    if algorithm == 'RS256':
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    elif algorithm == 'ES256':
+        private_key = ec.generate_private_key(ec.SECP256R1())
+    elif algorithm == 'EdDSA':
+        private_key = ed25519.Ed25519PrivateKey.generate()
+    else:
+        raise ValueError(f'Unsupported algorithm {algorithm}')
+
+    private_pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    ).decode()
+    public_pem = private_key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo,
+    ).decode()
+    return private_pem, public_pem
+
+
+def bench(algorithm: str, number: int) -> dict:
+    private_pem, public_pem = generate_keys(algorithm)
+    prepared = jwt.algorithms.get_default_algorithms()[algorithm]
+    private_key = prepared.prepare_key(private_pem)
+    public_key = prepared.prepare_key(public_pem)
+
+    payload = {'id': 'c0a8012e-0000-4000-8000-000000000000', 'exp': datetime.utcnow() + timedelta(minutes=30)}
+    token = jwt.encode(payload, private_key, algorithm=algorithm)
+
+    def per_call(func) -> float:
+        return timeit.timeit(func, number=number) / number * 1_000_000
+
+    return {
+        'encode_pem': per_call(lambda: jwt.encode(payload, private_pem, algorithm=algorithm)),
+        'encode_key': per_call(lambda: jwt.encode(payload, private_key, algorithm=algorithm)),
+        'decode_pem': per_call(lambda: jwt.decode(token, public_pem, algorithms=[algorithm])),
+        'decode_key': per_call(lambda: jwt.decode(token, public_key, algorithms=[algorithm])),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=2000)
+    args = parser.parse_args()
+
+    columns = ('encode_pem', 'encode_key', 'decode_pem', 'decode_key')
+    print(f'{"algorithm":<10}' + ''.join(f'{column + " us":>16}' for column in columns))
+    for algorithm in ('RS256', 'ES256', 'EdDSA'):
+        result = bench(algorithm, args.number)
+        print(f'{algorithm:<10}' + ''.join(f'{result[column]:>16.1f}' for column in columns))
+
+
+if __name__ == '__main__':
+    main()
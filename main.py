@@ -15,11 +15,22 @@ config = get_config()
 
 
 if __name__ == '__main__':
+    # Каждый воркер - отдельный процесс со своим event loop, пулом соединений к БД (см. pool_limits)
+    # и фоновыми воркерами заказов. По SIGTERM uvicorn перестаёт принимать соединения,
+    # ждёт завершения текущих запросов до API_GRACEFUL_SHUTDOWN_TIMEOUT и выполняет shutdown lifespan.
     uvicorn.run(
         'src.app:app',
         host=config.API_HOST,
         port=config.API_PORT,
+        workers=config.API_WORKERS,
+        loop=config.API_LOOP,
+        http=config.API_HTTP,
+        timeout_keep_alive=config.API_KEEPALIVE_TIMEOUT,
+        timeout_graceful_shutdown=config.API_GRACEFUL_SHUTDOWN_TIMEOUT,
+        # За TLS-прокси адрес соединения - адрес прокси, реальный IP клиента берётся из X-Forwarded-For
+        proxy_headers=True,
+        forwarded_allow_ips=config.API_FORWARDED_ALLOW_IPS,
         log_level='info',
-        ssl_certfile=config.SSL_CERT_PATH,
-        ssl_keyfile=config.SSL_PRIVATE_KEY_PATH
+        ssl_certfile=config.SSL_CERT_PATH or None,
+        ssl_keyfile=config.SSL_PRIVATE_KEY_PATH or None
     )
@@ -0,0 +1,83 @@
+"""add_balance_ledger
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 13:55:12.401226
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('balance_ledger_entry',
+    sa.Column('id', sa.BigInteger(), sa.Identity(always=False), nullable=False),
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.Column('amount', sa.BigInteger(), nullable=False),
+    sa.Column('operation', sa.String(length=32), nullable=False),
+    sa.Column('order_id', sa.Uuid(), nullable=True),
+    sa.Column('applied', sa.Boolean(), server_default='false', nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_balance_ledger_entry_user_id_id', 'balance_ledger_entry', ['user_id', 'id'], unique=False)
+    op.create_index(
+        'ix_balance_ledger_entry_not_applied',
+        'balance_ledger_entry',
+        ['user_id'],
+        unique=False,
+        postgresql_where=sa.text('NOT applied')
+    )
+
+    # Баланс переводится из рублей (float) в копейки (bigint).
+    # Ограничение из модели в ранних миграциях не создавалось, поэтому IF EXISTS.
+    op.execute('ALTER TABLE "user" DROP CONSTRAINT IF EXISTS check_balance_minimum')
+    op.alter_column('user', 'balance', server_default=None)
+    op.alter_column(
+        'user',
+        'balance',
+        existing_type=sa.Float(),
+        type_=sa.BigInteger(),
+        postgresql_using='round(balance * 100)::bigint'
+    )
+    op.alter_column('user', 'balance', server_default='0')
+    op.create_check_constraint('check_balance_minimum', 'user', 'balance >= 0')
+
+    # Текущие балансы становятся начальными записями журнала
+    op.execute(
+        "INSERT INTO balance_ledger_entry (user_id, amount, operation, applied) "
+        "SELECT id, balance, 'opening', true FROM \"user\" WHERE balance <> 0"
+    )
+
+
+def downgrade() -> None:
+    # Неприменённые зачисления переносятся в баланс перед удалением журнала
+    op.execute(
+        "UPDATE \"user\" SET balance = balance + pending.amount FROM ("
+        "SELECT user_id, sum(amount) AS amount FROM balance_ledger_entry WHERE NOT applied GROUP BY user_id"
+        ") AS pending WHERE \"user\".id = pending.user_id"
+    )
+    op.drop_constraint('check_balance_minimum', 'user', type_='check')
+    op.alter_column('user', 'balance', server_default=None)
+    op.alter_column(
+        'user',
+        'balance',
+        existing_type=sa.BigInteger(),
+        type_=sa.Float(),
+        postgresql_using='balance / 100.0'
+    )
+    op.alter_column('user', 'balance', server_default='0.0')
+
+    op.drop_index('ix_balance_ledger_entry_not_applied', table_name='balance_ledger_entry', postgresql_where=sa.text('NOT applied'))
+    op.drop_index('ix_balance_ledger_entry_user_id_id', table_name='balance_ledger_entry')
+    op.drop_table('balance_ledger_entry')
@@ -1,31 +1,127 @@
+import asyncio
 import time
-import traceback
-from pathlib import Path
+from contextlib import AsyncExitStack, asynccontextmanager
 
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_swagger_ui_html, get_swagger_ui_oauth2_redirect_html
-from starlette.staticfiles import StaticFiles
+from starlette.middleware.gzip import GZipMiddleware
 
+from src.database.session import DataBaseSessionManager
+from src.tap_bank.client import TapBankClient
 from src.tap_bank.router import tap_bank_route
+from src.tap_bank.workers import CallbackProcessor, IdempotencyKeyCleaner, OrderSubmitter
+from src.users.cache import user_cache
+from src.users.hashing import get_password_hasher
 from src.users.router import users_router
+from src.users.service import warm_up_jwt
+from src.users.workers import BalanceCompactor
+from src.users.utils import verified_token_cache
 from src.config import get_config
 from src.utils.logger import get_logger
+from src.utils.responses import default_response_class
+from src.utils.rate_limit import create_rate_limiter
+from src.utils.metrics import HttpMetrics, MetricsMiddleware, render_histograms, render_labeled_stats, render_stats
+from src.utils.static import STATIC_DIR, STATIC_URL, PrecompressedStaticFiles, static_url
 
 
 config = get_config()
-logger = get_logger(config.LOG_LVL, config.LOG_NAME, config.LOGS_PATH)
-
-
-app = FastAPI(docs_url=None, redoc_url=None, title='Salt API')
+logger = get_logger(
+    config.LOG_LVL,
+    config.LOG_NAME,
+    config.LOGS_PATH,
+    max_bytes=config.LOG_MAX_BYTES,
+    backup_count=config.LOG_BACKUP_COUNT,
+    rotation_when=config.LOG_ROTATION_WHEN,
+    json_format=config.LOG_JSON,
+)
+http_metrics = HttpMetrics()
+
+
+async def warm_up(session_manager: DataBaseSessionManager, tap_bank_client: TapBankClient) -> float:
+    """
+    Прогревает ресурсы до приёма трафика: соединения с БД, ключи JWT, пул bcrypt и соединения с TapBank.
+    Ошибка прогрева не мешает старту приложения, ресурс будет инициализирован при первом запросе.
+
+    Return:
+    - float: Длительность прогрева в секундах.
+    """
+    start = time.perf_counter()
+    steps = {
+        'database': session_manager.warm_up(config.WARMUP_DB_CONNECTIONS),
+        'jwt': asyncio.to_thread(warm_up_jwt),
+        'password_hasher': get_password_hasher().warm_up(),
+    }
+    if config.WARMUP_TAP_BANK:
+        steps['tap_bank'] = tap_bank_client.warm_up()
+
+    results = await asyncio.gather(*steps.values(), return_exceptions=True)
+    for name, result in zip(steps, results):
+        if isinstance(result, Exception):
+            logger.warning(f'Warm-up of {name} failed: {result}')
+
+    duration = time.perf_counter() - start
+    logger.info(f'Warm-up finished in {duration:.3f}s')
+    return duration
+
+
+def _shutdown_password_hasher() -> None:
+    get_password_hasher().shutdown()
+    get_password_hasher.cache_clear()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Компоненты останавливаются в обратном порядке, в том числе если старт прервался на середине:
+    # воркеры заказов и колбэков - до BalanceCompactor, чтобы их возвраты попали в последнюю компактизацию.
+    async with AsyncExitStack() as stack:
+        session_manager = DataBaseSessionManager(config)
+        stack.push_async_callback(session_manager.close)
+        stack.callback(_shutdown_password_hasher)
+        rate_limiter = create_rate_limiter(config, logger)
+        stack.push_async_callback(rate_limiter.close)
+        app.state.rate_limiter = rate_limiter
+        tap_bank_client = TapBankClient(config)
+        stack.push_async_callback(tap_bank_client.close)
+        await tap_bank_client.start()
+        app.state.tap_bank_client = tap_bank_client
+        app.state.warm_up_seconds = await warm_up(session_manager, tap_bank_client)
+        idempotency_key_cleaner = IdempotencyKeyCleaner(config, session_manager, logger)
+        stack.push_async_callback(idempotency_key_cleaner.stop)
+        await idempotency_key_cleaner.start()
+        app.state.idempotency_key_cleaner = idempotency_key_cleaner
+        balance_compactor = BalanceCompactor(config, session_manager, logger)
+        stack.push_async_callback(balance_compactor.stop)
+        await balance_compactor.start()
+        app.state.balance_compactor = balance_compactor
+        order_submitter = OrderSubmitter(config, tap_bank_client, session_manager, logger)
+        stack.push_async_callback(order_submitter.stop)
+        await order_submitter.start()
+        app.state.order_submitter = order_submitter
+        callback_processor = CallbackProcessor(config, session_manager, logger)
+        stack.push_async_callback(callback_processor.stop)
+        await callback_processor.start()
+        app.state.callback_processor = callback_processor
+        yield
+
+
+app = FastAPI(
+    docs_url=None,
+    redoc_url=None,
+    title='Salt API',
+    lifespan=lifespan,
+    default_response_class=default_response_class,
+)
 
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
+    # Traceback форматируется в потоке логгера, а не в event loop
     logger.critical(
         f'Unhandled exception. Request endpoint: {request.url.path}. Request method: {request.method}.\n'
-        f'Exception: {exc}\nTraceback: {traceback.format_exc()}\n'
+        f'Exception: {exc}',
+        exc_info=exc,
     )
     return JSONResponse(
         status_code=500,
@@ -40,9 +136,9 @@ async def custom_swagger_ui_html():
         openapi_url=app.openapi_url,
         title=f"{app.title} - Swagger UI",
         oauth2_redirect_url=app.swagger_ui_oauth2_redirect_url,
-        swagger_js_url="/static/js/swagger-ui-bundle.js",
-        swagger_css_url="/static/css/swagger-ui.css",
-        swagger_favicon_url="/static/img/favicon.png"
+        swagger_js_url=static_url('js/swagger-ui-bundle.js'),
+        swagger_css_url=static_url('css/swagger-ui.css'),
+        swagger_favicon_url=static_url('img/favicon.png')
     )
 
 
@@ -51,20 +147,41 @@ async def swagger_ui_redirect():
     return get_swagger_ui_oauth2_redirect_html()
 
 
-@app.middleware('http')
-async def add_process_time_header(request: Request, call_next):
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers['X-Process-Time'] = str(process_time)
-    return response
+@app.get('/metrics', include_in_schema=False)
+async def metrics(request: Request):
+    session_manager = DataBaseSessionManager(config)
+    pool_stats = session_manager.pool_stats()
+    lines = http_metrics.render()
+    lines += render_stats('app', {'warm_up_seconds': request.app.state.warm_up_seconds})
+    lines += render_stats('password_hasher', get_password_hasher().stats())
+    lines += render_stats('verified_token_cache', verified_token_cache.stats())
+    lines += render_stats('user_cache', user_cache.stats())
+    tap_bank_client = request.app.state.tap_bank_client
+    lines += render_stats('trade_methods_cache', tap_bank_client.trade_methods_cache.stats())
+    lines += render_labeled_stats('tap_bank', tap_bank_client.stats())
+    lines += render_histograms(
+        'tap_bank_request_duration_seconds',
+        'TapBank request duration in seconds.',
+        [({'endpoint': endpoint}, histogram) for endpoint, histogram in tap_bank_client.latency.items()]
+    )
+    lines += render_stats('order_submitter', request.app.state.order_submitter.stats())
+    lines += render_stats('order_callbacks', request.app.state.callback_processor.stats())
+    lines += render_stats('balance_compactor', request.app.state.balance_compactor.stats())
+    lines += render_stats('idempotency_key_cleaner', request.app.state.idempotency_key_cleaner.stats())
+    lines += render_stats('rate_limiter', {'backend_errors': request.app.state.rate_limiter.backend_errors})
+    lines += render_labeled_stats('rate_limit', request.app.state.rate_limiter.stats())
+    lines += render_labeled_stats(
+        'db_pool',
+        [({'pool': 'primary'}, pool_stats['primary'])]
+        + [({'pool': f'replica_{index}'}, stats) for index, stats in enumerate(pool_stats['replicas'])]
+    )
+    return PlainTextResponse('\n'.join(lines) + '\n', media_type='text/plain; version=0.0.4')
 
 
 origins = ['http://localhost:8000']
 
 
-static_dir = Path(__file__).parent.parent / 'static'
-app.mount("/static", StaticFiles(directory=static_dir), name="static")
+app.mount(STATIC_URL, PrecompressedStaticFiles(directory=STATIC_DIR), name="static")
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -72,6 +189,8 @@ app.add_middleware(
     allow_methods=['*'],
     allow_headers=['*'],
 )
+app.add_middleware(GZipMiddleware, minimum_size=config.GZIP_MINIMUM_SIZE, compresslevel=config.GZIP_COMPRESS_LEVEL)
+app.add_middleware(MetricsMiddleware, metrics=http_metrics)
 
 app.include_router(users_router)
 app.include_router(tap_bank_route)
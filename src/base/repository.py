@@ -1,7 +1,11 @@
-from typing import Callable, Generic, Iterable, Optional, Type, TypeVar, Union
+import base64
+import json
+from datetime import date, datetime
+from typing import Callable, Generic, Iterable, Optional, Sequence, Type, TypeVar, Union
+from uuid import UUID
 
 from fastapi import Depends
-from sqlalchemy import inspect, select
+from sqlalchemy import insert, inspect, select, tuple_
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import Select
@@ -47,10 +51,82 @@ class BaseRepository(Generic[Model]):
             return None
         return instance
 
+    async def create_many(self, data: list[dict]) -> list[Model]:
+        """Создаёт все записи одним многострочным INSERT ... RETURNING, порядок результата совпадает с data."""
+        if not data:
+            return []
+        query = insert(self.model).returning(self.model, sort_by_parameter_order=True)
+
+        try:
+            result = await self.session.scalars(query, data)
+        except IntegrityError:
+            await self.session.rollback()
+            return []
+        return list(result.all())
+
     def pagination(self, query: Select, page: int, limit: int) -> Select:
         offset = (page - 1) * limit
         return query.limit(limit).offset(offset)
 
+    async def keyset_page(
+            self,
+            query: Select,
+            limit: int,
+            cursor: Optional[str] = None,
+            column_names: Sequence[str] = ('id',),
+            descending: bool = False,
+    ) -> tuple[list[Model], Optional[str]]:
+        """
+        Keyset (cursor) пагинация: вместо OFFSET следующая страница выбирается условием
+        (col1, col2, ...) > (значения последней строки), поэтому глубина страницы не влияет на скорость
+        при наличии индекса по column_names. Набор column_names должен однозначно упорядочивать строки.
+
+        Return:
+        - tuple: строки страницы и непрозрачный курсор следующей страницы (None, если страница последняя).
+        """
+        columns = [getattr(self.model, name) for name in column_names]
+        if cursor:
+            values = self.decode_cursor(cursor, columns)
+            comparison = tuple_(*columns) < tuple_(*values) if descending else tuple_(*columns) > tuple_(*values)
+            query = query.where(comparison)
+        query = query.order_by(*[column.desc() if descending else column.asc() for column in columns])
+
+        result = await self.session.scalars(query.limit(limit + 1))
+        items = list(result.all())
+        if len(items) <= limit:
+            return items, None
+        items = items[:limit]
+        return items, self.encode_cursor([getattr(items[-1], name) for name in column_names])
+
+    @staticmethod
+    def encode_cursor(values: Sequence) -> str:
+        raw = json.dumps([value.isoformat() if isinstance(value, (date, datetime)) else str(value) for value in values])
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str, columns: Sequence) -> list:
+        """Raises ValueError, если курсор повреждён."""
+        try:
+            raw_values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (ValueError, TypeError):
+            raise ValueError('Invalid cursor')
+        if not isinstance(raw_values, list) or len(raw_values) != len(columns):
+            raise ValueError('Invalid cursor')
+
+        values = []
+        try:
+            for column, raw_value in zip(columns, raw_values):
+                python_type = column.type.python_type
+                if python_type is datetime:
+                    values.append(datetime.fromisoformat(raw_value))
+                elif python_type is UUID:
+                    values.append(UUID(raw_value))
+                else:
+                    values.append(python_type(raw_value))
+        except (ValueError, TypeError, AttributeError):
+            raise ValueError('Invalid cursor')
+        return values
+
     def order_by(self, query: Select, descending: bool, column_name: str) -> Select:
         order_column = getattr(self.model, column_name)
         order_column = order_column.desc() if descending else order_column.asc()
@@ -64,3 +140,12 @@ def get_repository(
         return repository_type(session)
 
     return func
+
+
+def get_read_repository(
+        repository_type: Type[BaseRepository],
+) -> Callable[[AsyncSession], BaseRepository]:
+    def func(session: AsyncSession = Depends(session_module.get_read_session)) -> BaseRepository:
+        return repository_type(session)
+
+    return func
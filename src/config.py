@@ -11,12 +11,22 @@ import pytz
 
 class Config(BaseSettings):
     DATABASE_URL: str = ''
+    DATABASE_REPLICA_URLS: list[str] = []
 
     DB_HOST: str
     DB_PORT: str
     DB_NAME: str
     DB_USER: SecretStr
     DB_PASS: SecretStr
+    DB_REPLICA_HOSTS: str = ''  # host[:port] через запятую
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_MAX_CONNECTIONS: int = 0  # лимит соединений к одному серверу на все воркеры API, 0 - без лимита
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 100
 
     TIMEZONE: pytz.BaseTzInfo = pytz.timezone('Europe/Moscow')
 
@@ -27,19 +37,115 @@ class Config(BaseSettings):
     JWT_ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     REFRESH_TOKEN_EXPIRE_MINUTES: int
+    VERIFIED_TOKEN_CACHE_SIZE: int = 10000
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL: float = 30.0
+    # Сколько секунд после изменения пользователь читается с основной БД и не кэшируется (допустимое отставание реплик)
+    USER_REPLICA_LAG: float = 5.0
+
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+    PASSWORD_HASH_EXECUTOR: str = 'thread'
 
     API_HOST: str
     API_PORT: int
-
-    SSL_CERT_PATH: str
-    SSL_PRIVATE_KEY_PATH: str
+    API_WORKERS: int = 1
+    API_LOOP: str = 'auto'  # auto выбирает uvloop, если он установлен
+    API_HTTP: str = 'auto'  # auto выбирает httptools, если он установлен
+    API_KEEPALIVE_TIMEOUT: int = 5
+    API_GRACEFUL_SHUTDOWN_TIMEOUT: float = 30.0
+    # Адреса или сети прокси через запятую, чьим X-Forwarded-For/X-Forwarded-Proto можно доверять: по ним
+    # определяется IP клиента для rate limit и allowlist колбэков. * - любому источнику, только если API недоступно напрямую.
+    API_FORWARDED_ALLOW_IPS: str = '127.0.0.1'
+    WARMUP_DB_CONNECTIONS: int = 5  # не больше размера пула, 0 - не прогревать
+    WARMUP_TAP_BANK: bool = True
+
+    SSL_CERT_PATH: str = ''  # пусто - TLS терминируется на прокси
+    SSL_PRIVATE_KEY_PATH: str = ''
 
     LOG_LVL: str
     LOGS_PATH: str
     LOG_NAME: str
+    LOG_MAX_BYTES: int = 0
+    LOG_BACKUP_COUNT: int = 5
+    LOG_ROTATION_WHEN: str = ''
+    LOG_JSON: bool = False
+
+    GZIP_MINIMUM_SIZE: int = 1024
+    GZIP_COMPRESS_LEVEL: int = 5
 
     TAP_BANK_BASE_URL: str
     TAP_BANK_API_TOKEN: str
+    TAP_BANK_POOL_LIMIT: int = 100
+    TAP_BANK_POOL_LIMIT_PER_HOST: int = 50
+    TAP_BANK_DNS_CACHE_TTL: int = 300
+    TAP_BANK_KEEPALIVE_TIMEOUT: float = 30.0
+    TAP_BANK_CONNECT_TIMEOUT: float = 5.0
+    TAP_BANK_TRADE_METHODS_TIMEOUT: float = 10.0
+    TAP_BANK_ORDER_TIMEOUT: float = 30.0
+    TAP_BANK_TRADE_METHODS_CONCURRENCY: int = 10  # одновременных запросов на каждый эндпоинт
+    TAP_BANK_ORDER_CONCURRENCY: int = 50
+    TAP_BANK_BULKHEAD_MAX_WAIT: float = 1.0
+    TAP_BANK_BREAKER_WINDOW: int = 50  # последних запросов к эндпоинту
+    TAP_BANK_BREAKER_MIN_CALLS: int = 20
+    TAP_BANK_BREAKER_FAILURE_RATE: float = 0.5
+    TAP_BANK_BREAKER_SLOW_CALL_DURATION: float = 10.0
+    TAP_BANK_BREAKER_SLOW_CALL_RATE: float = 0.8
+    TAP_BANK_BREAKER_OPEN_TIMEOUT: float = 30.0
+    TAP_BANK_BREAKER_HALF_OPEN_CALLS: int = 3
+
+    ORDER_SUBMIT_CONCURRENCY: int = 10
+    ORDER_BATCH_MAX_SIZE: int = 500
+    ORDER_BATCH_CONCURRENCY: int = 20
+    ORDER_SUBMIT_QUEUE_SIZE: int = 1000
+    ORDER_SUBMIT_MAX_RETRIES: int = 3
+    ORDER_SUBMIT_BACKOFF: float = 0.5
+    ORDER_SUBMIT_DRAIN_TIMEOUT: float = 10.0
+    # Заказ, дольше ORDER_SUBMIT_STALE_AFTER секунд находящийся в submitting, возвращается в очередь.
+    # Должно быть больше времени всех попыток отправки одного заказа.
+    ORDER_SUBMIT_STALE_AFTER: float = 600.0
+    ORDER_SUBMIT_RECOVERY_INTERVAL: float = 60.0
+
+    # Callback'и принимаются только с подписью HMAC-SHA256 тела (hex) и/или с разрешённых адресов.
+    # Если не задано ни то, ни другое, все callback'и отклоняются.
+    TAP_BANK_CALLBACK_SECRET: SecretStr = SecretStr('')
+    TAP_BANK_CALLBACK_SIGNATURE_HEADER: str = 'X-Signature'
+    TAP_BANK_CALLBACK_ALLOWED_IPS: list[str] = []  # адреса или подсети
+
+    CALLBACK_BATCH_SIZE: int = 100
+    CALLBACK_BATCH_DELAY: float = 0.01
+    CALLBACK_QUEUE_SIZE: int = 10000
+    CALLBACK_DEDUP_CACHE_SIZE: int = 100000
+    CALLBACK_DEDUP_CACHE_TTL: float = 3600.0
+
+    BALANCE_COMPACT_INTERVAL: float = 1.0
+    BALANCE_COMPACT_BATCH_SIZE: int = 1000
+
+    RATE_LIMIT_BACKEND: str = 'memory'  # memory - в пределах воркера, redis - общий для всех воркеров
+    RATE_LIMIT_REDIS_URL: str = ''
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    # Политика: (токенов в секунду, ёмкость корзины), rate 0 - без ограничения
+    RATE_LIMITS: dict[str, tuple[float, int]] = {
+        'auth': (0.2, 10),  # на IP
+        'auth_global': (20.0, 50),  # общий, bcrypt
+        'orders': (5.0, 20),  # на пользователя
+        'order_batches': (0.2, 5),  # на пользователя
+        'trade_methods': (2.0, 20),  # на пользователя
+        'tap_bank': (50.0, 100),  # общий, квота запросов к TapBank
+    }
+
+    IDEMPOTENCY_CACHE_SIZE: int = 10000
+    IDEMPOTENCY_CACHE_TTL: float = 3600.0
+    IDEMPOTENCY_KEY_TTL: float = 86400.0  # сколько ключи хранятся в БД
+    # Ключ, чей запрос не завершился за это время (упал процесс), отвечает текущим состоянием заказа
+    IDEMPOTENCY_PENDING_TIMEOUT: float = 600.0
+    IDEMPOTENCY_WAIT_TIMEOUT: float = 35.0  # сколько повтор ждёт исходный запрос из другого процесса
+    IDEMPOTENCY_WAIT_INTERVAL: float = 0.2
+    IDEMPOTENCY_CLEANUP_INTERVAL: float = 300.0
+    IDEMPOTENCY_CLEANUP_BATCH_SIZE: int = 1000
+
+    TRADE_METHODS_CACHE_TTL: float = 60.0
+    TRADE_METHODS_CACHE_STALE_TTL: float = 300.0
 
     model_config = SettingsConfigDict(env_file='.env')
 
@@ -49,10 +155,18 @@ class Config(BaseSettings):
         load_dotenv(_env_file, override=True)
         super().__init__(**kwargs)
 
-        self.DATABASE_URL = (
+        self.DATABASE_URL = self._database_url(f'{self.DB_HOST}:{self.DB_PORT}')
+        self.DATABASE_REPLICA_URLS = [
+            self._database_url(host if ':' in host else f'{host}:{self.DB_PORT}')
+            for host in (host.strip() for host in self.DB_REPLICA_HOSTS.split(','))
+            if host
+        ]
+
+    def _database_url(self, address: str) -> str:
+        return (
             f'postgresql+asyncpg://'
             f'{self.DB_USER.get_secret_value()}:{self.DB_PASS.get_secret_value()}@'
-            f'{self.DB_HOST}:{self.DB_PORT}'
+            f'{address}'
             f'/{self.DB_NAME}'
         )
 
@@ -1,11 +1,12 @@
 from typing import Annotated, Union
 
-from sqlalchemy import String
+from sqlalchemy import BigInteger, String
 from sqlalchemy.dialects.postgresql import JSON
 from sqlalchemy.orm import mapped_column
 
 
 int_pk = Annotated[int, mapped_column(primary_key=True, autoincrement=True)]
+money_minor = Annotated[int, mapped_column(BigInteger)]  # деньги в минорных единицах (копейках)
 str_32 = Annotated[str, mapped_column(String(32))]
 str_64 = Annotated[str, mapped_column(String(64))]
 str_255 = Annotated[str, mapped_column(String(255))]
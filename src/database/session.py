@@ -1,7 +1,11 @@
 import contextlib
+import itertools
+import time
 from typing import AsyncIterator, Optional
 
-from sqlalchemy import exc
+from sqlalchemy import event, exc, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     async_sessionmaker,
@@ -13,6 +17,105 @@ from fastapi import Depends
 from src.config import get_config, Config
 
 
+HAS_WRITES_KEY = 'has_writes'
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _mark_write_statement(orm_execute_state) -> None:
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info[HAS_WRITES_KEY] = True
+
+
+@event.listens_for(Session, 'after_flush')
+def _mark_flush(session: Session, flush_context) -> None:
+    session.info[HAS_WRITES_KEY] = True
+
+
+def has_writes(session: AsyncSession) -> bool:
+    """Выполняла ли сессия запись (flush или UPDATE/INSERT/DELETE) за время своей жизни."""
+    return bool(session.info.get(HAS_WRITES_KEY) or session.new or session.dirty or session.deleted)
+
+
+class TimedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, который считает ожидания соединения и таймауты получения.
+    Ожиданием считается только получение соединения из исчерпанного пула: свободных соединений нет
+    и max_overflow достигнут. Получение свободного соединения или открытие нового в пределах
+    overflow в wait_count и время ожидания не попадает.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_count = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.timeouts = 0
+
+    def exhausted(self) -> bool:
+        return self.checkedin() == 0 and -1 < self._max_overflow <= self._overflow
+
+    def connect(self):
+        if not self.exhausted():
+            return super().connect()
+
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            wait_time = time.perf_counter() - start
+            self.wait_count += 1
+            self.wait_time_total += wait_time
+            self.wait_time_max = max(self.wait_time_max, wait_time)
+
+    def stats(self) -> dict:
+        return {
+            'size': self.size(),
+            'checked_in': self.checkedin(),
+            'checked_out': self.checkedout(),
+            'overflow': self.overflow(),
+            'wait_count': self.wait_count,
+            'wait_time_total': self.wait_time_total,
+            'wait_time_max': self.wait_time_max,
+            'timeouts': self.timeouts,
+        }
+
+
+def pool_limits(config: Config) -> tuple[int, int]:
+    """
+    Размер пула и max_overflow для одного процесса.
+
+    Если задан DB_MAX_CONNECTIONS, лимит делится между API_WORKERS процессами,
+    чтобы pool_size + max_overflow всех воркеров не превышали его.
+    """
+    if config.DB_MAX_CONNECTIONS <= 0:
+        return config.DB_POOL_SIZE, config.DB_MAX_OVERFLOW
+    per_worker = max(config.DB_MAX_CONNECTIONS // max(config.API_WORKERS, 1), 1)
+    pool_size = min(config.DB_POOL_SIZE, per_worker)
+    return pool_size, min(config.DB_MAX_OVERFLOW, per_worker - pool_size)
+
+
+def create_engine(config: Config, url: str):
+    pool_size, max_overflow = pool_limits(config)
+    return create_async_engine(
+        url,
+        poolclass=TimedAsyncAdaptedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+        pool_recycle=config.DB_POOL_RECYCLE,
+        pool_pre_ping=config.DB_POOL_PRE_PING,
+        connect_args={
+            # Кэш prepared statements самого asyncpg и кэш адаптера SQLAlchemy.
+            # Для pgbouncer в режиме transaction оба нужно выставить в 0.
+            'statement_cache_size': config.DB_STATEMENT_CACHE_SIZE,
+            'prepared_statement_cache_size': config.DB_PREPARED_STATEMENT_CACHE_SIZE,
+        },
+    )
+
+
 class DataBaseSessionManager:
     _instance: Optional['DataBaseSessionManager'] = None
     _initialized: bool = False
@@ -25,16 +128,46 @@ class DataBaseSessionManager:
     def __init__(self, config: Config):
         self.config = config
         if not self._initialized:
-            self.engine = create_async_engine(self.config.DATABASE_URL)
+            self.engine = create_engine(self.config, self.config.DATABASE_URL)
             self.session_maker = async_sessionmaker(self.engine, expire_on_commit=False)
+            self.replica_engines = [create_engine(self.config, url) for url in self.config.DATABASE_REPLICA_URLS]
+            # Сессии чтения работают в AUTOCOMMIT: каждый SELECT выполняется сам по себе,
+            # без BEGIN перед первым запросом и ROLLBACK при возврате соединения в пул
+            self.read_session_makers = [
+                async_sessionmaker(engine.execution_options(isolation_level='AUTOCOMMIT'), expire_on_commit=False)
+                for engine in self.replica_engines or [self.engine]
+            ]
+            self._read_index = itertools.cycle(range(len(self.read_session_makers)))
         self._initialized = True
 
+    def pool_stats(self) -> dict:
+        if self.engine is None:
+            return {}
+        return {
+            'primary': self.engine.pool.stats(),
+            'replicas': [engine.pool.stats() for engine in self.replica_engines],
+        }
+
+    async def warm_up(self, connections: int) -> None:
+        """Заранее открывает до connections соединений в каждом пуле, чтобы первые запросы не ждали подключения."""
+        pool_size, _ = pool_limits(self.config)
+        connections = min(connections, pool_size)
+        for engine in [self.engine, *self.replica_engines]:
+            async with contextlib.AsyncExitStack() as stack:
+                for _ in range(connections):
+                    connection = await stack.enter_async_context(engine.connect())
+                    await connection.execute(text('SELECT 1'))
+
     async def close(self) -> None:
         if not self.engine:
             raise Exception("DatabaseSessionManager is not initialized")
         await self.engine.dispose()
+        for engine in self.replica_engines:
+            await engine.dispose()
         self.engine = None
         self.session_maker = None
+        self.replica_engines = []
+        self.read_session_makers = []
         self._instance = None
         self._initialized = False
 
@@ -51,6 +184,19 @@ class DataBaseSessionManager:
                 await session.rollback()
                 raise
 
+    @contextlib.asynccontextmanager
+    async def read_session(self) -> AsyncIterator[AsyncSession]:
+        """
+        Сессия для чтения на одной из реплик (round-robin) в режиме AUTOCOMMIT, без коммита.
+        Запросы сессии не образуют одну транзакцию, поэтому она подходит для чтений одним запросом.
+        Если реплики не настроены, используется основной сервер.
+        """
+        if not self.read_session_makers:
+            raise Exception("DatabaseSessionManager is not initialized")
+
+        async with self.read_session_makers[next(self._read_index)]() as session:
+            yield session
+
     @contextlib.asynccontextmanager
     async def connect_api_db(self) -> AsyncIterator[AsyncConnection]:
         if self.engine is None:
@@ -90,3 +236,22 @@ async def get_session_manager(config: Config = Depends(get_config)):
 async def get_async_session(session_manager: DataBaseSessionManager = Depends(get_session_manager)):
     async with session_manager.session() as session:
         yield session
+
+
+async def get_read_session(
+        session_manager: DataBaseSessionManager = Depends(get_session_manager),
+        primary_session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Сессия для зависимостей, которые только читают: AUTOCOMMIT на реплике.
+
+    Основная сессия запроса используется вместо реплики, если в рамках запроса через неё уже
+    была запись (read-your-writes), а также если реплики не настроены - чтобы запрос не держал
+    два соединения из одного пула. Основная сессия не берёт соединение, пока к ней не обратились.
+    """
+    if not session_manager.replica_engines or has_writes(primary_session):
+        yield primary_session
+        return
+
+    async with session_manager.read_session() as session:
+        yield session
@@ -0,0 +1,222 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import aiohttp
+import orjson
+
+from src.config import Config
+from src.utils.cache import TTLCache
+from src.utils.exceptions import CustomHTTPException
+from src.utils.metrics import Histogram
+from src.utils.resilience import Bulkhead, BulkheadFullError, CircuitBreaker
+
+
+class TapBankError(CustomHTTPException):
+    def __init__(self, message: str, status_code: int, retryable: bool):
+        self.retryable = retryable
+        super().__init__(message, status_code=status_code)
+
+
+@dataclass(frozen=True)
+class TapBankResponse:
+    """
+    Ответ TapBank как есть: статус, Content-Type и тело в байтах.
+
+    Тело разбирается только при вызове json(), поэтому ответ можно отдать клиенту без разбора и повторной сериализации.
+    """
+    status: int
+    content_type: str
+    body: bytes
+
+    def json(self) -> Any:
+        try:
+            return orjson.loads(self.body)
+        except orjson.JSONDecodeError:
+            raise TapBankError('TapBank responded with invalid JSON', status_code=502, retryable=False)
+
+
+class TapBankClient:
+    """
+    HTTP-клиент TapBank с общим пулом keep-alive соединений.
+
+    Создаётся один раз на процесс в lifespan приложения и переиспользуется всеми роутами,
+    поэтому TCP/TLS-рукопожатие и DNS-запрос выполняются только при открытии нового соединения в пуле.
+
+    У каждого эндпоинта TapBank свой bulkhead (лимит одновременных запросов) и circuit breaker:
+    при деградации TapBank запросы быстро отклоняются с 503, а не копятся в ожидании таймаута.
+    """
+
+    PAYOUT_METHODS_PATH = '/public/api/v1/shop/trade-methods/payout'
+    PAYIN_METHODS_PATH = '/public/api/v1/shop/trade-methods'
+    SYNC_REQUISITES_PATH = '/public/api/v1/shop/orders/sync-requisites'
+
+    PAYOUT_METHODS = 'payout_methods'
+    PAYIN_METHODS = 'payin_methods'
+    SYNC_REQUISITES = 'sync_requisites'
+
+    def __init__(self, config: Config):
+        self.config = config
+        self.base_url = config.TAP_BANK_BASE_URL.rstrip('/')
+        self.headers = {'Authorization': 'Bearer ' + config.TAP_BANK_API_TOKEN}
+        self.session: Optional[aiohttp.ClientSession] = None
+        # Списки методов одинаковы для всех пользователей магазина и меняются редко.
+        self.trade_methods_cache = TTLCache(
+            ttl=config.TRADE_METHODS_CACHE_TTL,
+            stale_ttl=config.TRADE_METHODS_CACHE_STALE_TTL,
+        )
+        self.bulkheads = {
+            self.PAYOUT_METHODS: Bulkhead(config.TAP_BANK_TRADE_METHODS_CONCURRENCY, config.TAP_BANK_BULKHEAD_MAX_WAIT),
+            self.PAYIN_METHODS: Bulkhead(config.TAP_BANK_TRADE_METHODS_CONCURRENCY, config.TAP_BANK_BULKHEAD_MAX_WAIT),
+            self.SYNC_REQUISITES: Bulkhead(config.TAP_BANK_ORDER_CONCURRENCY, config.TAP_BANK_BULKHEAD_MAX_WAIT),
+        }
+        self.breakers = {
+            endpoint: CircuitBreaker(
+                window=config.TAP_BANK_BREAKER_WINDOW,
+                min_calls=config.TAP_BANK_BREAKER_MIN_CALLS,
+                failure_rate=config.TAP_BANK_BREAKER_FAILURE_RATE,
+                slow_call_duration=config.TAP_BANK_BREAKER_SLOW_CALL_DURATION,
+                slow_call_rate=config.TAP_BANK_BREAKER_SLOW_CALL_RATE,
+                open_timeout=config.TAP_BANK_BREAKER_OPEN_TIMEOUT,
+                half_open_calls=config.TAP_BANK_BREAKER_HALF_OPEN_CALLS,
+            )
+            for endpoint in self.bulkheads
+        }
+        self.latency = {endpoint: Histogram() for endpoint in self.bulkheads}
+
+    async def start(self) -> None:
+        if self.session is not None:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.config.TAP_BANK_POOL_LIMIT,
+            limit_per_host=self.config.TAP_BANK_POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=self.config.TAP_BANK_DNS_CACHE_TTL,
+            keepalive_timeout=self.config.TAP_BANK_KEEPALIVE_TIMEOUT,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers=self.headers,
+            timeout=self._timeout(self.config.TAP_BANK_ORDER_TIMEOUT),
+        )
+
+    async def warm_up(self) -> None:
+        """Открывает соединения с TapBank и заполняет кэш методов оплаты."""
+        await asyncio.gather(self.get_payin_methods(), self.get_payout_methods())
+
+    async def close(self) -> None:
+        if self.session is None:
+            return
+        await self.session.close()
+        self.session = None
+
+    async def get_payout_methods(self) -> TapBankResponse:
+        return await self._get_trade_methods(self.PAYOUT_METHODS, self.PAYOUT_METHODS_PATH)
+
+    async def get_payin_methods(self) -> TapBankResponse:
+        return await self._get_trade_methods(self.PAYIN_METHODS, self.PAYIN_METHODS_PATH)
+
+    async def create_sync_requisites(self, data: dict, raise_for_status: bool = False) -> TapBankResponse:
+        return await self._request(
+            self.SYNC_REQUISITES,
+            'POST',
+            self.SYNC_REQUISITES_PATH,
+            timeout=self.config.TAP_BANK_ORDER_TIMEOUT,
+            raise_for_status=raise_for_status,
+            json=data
+        )
+
+    async def _get_trade_methods(self, endpoint: str, path: str) -> TapBankResponse:
+        return await self.trade_methods_cache.get_or_load(
+            path,
+            lambda: self._request(
+                endpoint,
+                'GET',
+                path,
+                timeout=self.config.TAP_BANK_TRADE_METHODS_TIMEOUT,
+                raise_for_status=True
+            )
+        )
+
+    def _timeout(self, total: float) -> aiohttp.ClientTimeout:
+        return aiohttp.ClientTimeout(total=total, connect=self.config.TAP_BANK_CONNECT_TIMEOUT)
+
+    def stats(self) -> list[tuple[dict, dict]]:
+        return [
+            (
+                {'endpoint': endpoint},
+                {
+                    **{f'bulkhead_{key}': value for key, value in self.bulkheads[endpoint].stats().items()},
+                    **{f'breaker_{key}': value for key, value in self.breakers[endpoint].stats().items()},
+                }
+            )
+            for endpoint in self.bulkheads
+        ]
+
+    async def _request(
+            self,
+            endpoint: str,
+            method: str,
+            path: str,
+            timeout: float,
+            raise_for_status: bool = False,
+            **kwargs
+    ) -> TapBankResponse:
+        breaker = self.breakers[endpoint]
+        generation = breaker.admit()
+        if generation is None:
+            raise TapBankError('TapBank is unavailable, circuit breaker is open', status_code=503, retryable=True)
+
+        # Ошибками TapBank считаются таймауты, ошибки соединения, 5xx и 429, но не 4xx на сам запрос
+        success = None
+        start = time.perf_counter()
+        try:
+            async with self.bulkheads[endpoint]:
+                start = time.perf_counter()
+                response = await self._send(method, path, timeout, raise_for_status, **kwargs)
+                success = response.status < 500 and response.status != 429
+                return response
+        except BulkheadFullError as error:
+            raise TapBankError(f'Too many concurrent TapBank requests: {error}', status_code=503, retryable=True)
+        except TapBankError as error:
+            success = not error.retryable
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            if success is not None:
+                self.latency[endpoint].observe(duration)
+            breaker.record(generation, success, duration)
+
+    async def _send(
+            self,
+            method: str,
+            path: str,
+            timeout: float,
+            raise_for_status: bool = False,
+            **kwargs
+    ) -> TapBankResponse:
+        if self.session is None:
+            raise Exception("TapBankClient is not started")
+
+        try:
+            async with self.session.request(
+                method,
+                f'{self.base_url}{path}',
+                timeout=self._timeout(timeout),
+                **kwargs
+            ) as response:
+                if raise_for_status and response.status >= 400:
+                    raise TapBankError(
+                        f'TapBank responded with status {response.status}',
+                        status_code=502,
+                        retryable=response.status >= 500 or response.status == 429
+                    )
+                return TapBankResponse(
+                    status=response.status,
+                    content_type=response.headers.get('Content-Type', 'application/json'),
+                    body=await response.read(),
+                )
+        except asyncio.TimeoutError:
+            raise TapBankError('TapBank request timed out', status_code=504, retryable=True)
+        except aiohttp.ClientError as error:
+            raise TapBankError(f'TapBank request failed: {error}', status_code=502, retryable=True)
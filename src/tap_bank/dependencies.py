@@ -1,14 +1,69 @@
+import hashlib
+import hmac
+import ipaddress
 from typing import Annotated
 
-from fastapi import Depends
+from fastapi import Depends, HTTPException, Request, status
 
-from src.base.repository import get_repository
-from src.tap_bank.service import OrderService
+from src.config import Config, get_config
+from src.base.repository import get_read_repository, get_repository
+from src.tap_bank.client import TapBankClient
+from src.tap_bank.service import IdempotencyService, OrderService
+from src.tap_bank.workers import CallbackProcessor, OrderSubmitter
 
-from src.tap_bank.repositories import OrderRepository
+from src.tap_bank.repositories import IdempotencyKeyRepository, OrderRepository
 
 
 def get_order_service(
         repository: Annotated[OrderRepository, Depends(get_repository(OrderRepository))]
 ):
     return OrderService(repository)
+
+
+def get_read_order_service(
+        repository: Annotated[OrderRepository, Depends(get_read_repository(OrderRepository))]
+):
+    return OrderService(repository)
+
+
+def get_idempotency_service(
+        repository: Annotated[IdempotencyKeyRepository, Depends(get_repository(IdempotencyKeyRepository))]
+):
+    return IdempotencyService(repository)
+
+
+def get_tap_bank_client(request: Request) -> TapBankClient:
+    return request.app.state.tap_bank_client
+
+
+def get_order_submitter(request: Request) -> OrderSubmitter:
+    return request.app.state.order_submitter
+
+
+def get_callback_processor(request: Request) -> CallbackProcessor:
+    return request.app.state.callback_processor
+
+
+async def verify_callback(request: Request, config: Annotated[Config, Depends(get_config)]) -> None:
+    """
+    Пропускает callback только с разрешённого адреса (TAP_BANK_CALLBACK_ALLOWED_IPS)
+    и с верной подписью HMAC-SHA256 тела (TAP_BANK_CALLBACK_SECRET), если они заданы.
+    """
+    secret = config.TAP_BANK_CALLBACK_SECRET.get_secret_value()
+    allowed_ips = config.TAP_BANK_CALLBACK_ALLOWED_IPS
+    if not secret and not allowed_ips:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Callback verification is not configured')
+
+    if allowed_ips:
+        try:
+            client_ip = ipaddress.ip_address(request.client.host if request.client else '')
+        except ValueError:
+            client_ip = None
+        if client_ip is None or not any(client_ip in ipaddress.ip_network(network, strict=False) for network in allowed_ips):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Forbidden')
+
+    if secret:
+        signature = request.headers.get(config.TAP_BANK_CALLBACK_SIGNATURE_HEADER, '')
+        expected = hmac.new(secret.encode(), await request.body(), hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(signature.lower(), expected):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid callback signature')
@@ -0,0 +1,78 @@
+import asyncio
+import contextlib
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Hashable, Optional
+from uuid import UUID
+
+from fastapi import Response
+
+from src.config import get_config
+from src.utils.cache import ExpiringLRUCache
+
+
+config = get_config()
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    """Ответ, сохранённый по Idempotency-Key, и хэш запроса, на который он был дан."""
+    request_hash: str
+    status_code: Optional[int]  # None - исходный запрос ещё выполняется
+    content_type: Optional[str]
+    body: Optional[bytes]
+    order_id: Optional[UUID] = None
+    abandoned: bool = False  # исходный запрос не завершился за IDEMPOTENCY_PENDING_TIMEOUT
+
+    @property
+    def completed(self) -> bool:
+        return self.status_code is not None
+
+    def to_response(self) -> Response:
+        return Response(
+            content=self.body,
+            status_code=self.status_code,
+            media_type=self.content_type,
+            headers={'Idempotent-Replayed': 'true'}
+        )
+
+
+# Горячий кэш готовых ответов: ключ - (user_id, Idempotency-Key). Незавершённые запросы в нём не хранятся.
+idempotency_cache = ExpiringLRUCache(maxsize=config.IDEMPOTENCY_CACHE_SIZE, clock=time.monotonic)
+
+
+def cache_response(key: Hashable, response: StoredResponse) -> None:
+    idempotency_cache.set(key, response, expires_at=time.monotonic() + config.IDEMPOTENCY_CACHE_TTL)
+
+
+class KeyLocks:
+    """
+    Блокировки по ключу внутри процесса. Параллельный дубликат ждёт завершения исходного запроса
+    и затем получает его ответ из кэша, не обращаясь к БД.
+    """
+
+    def __init__(self):
+        # ключ -> (блокировка, число запросов, ожидающих её или держащих)
+        self._locks: dict[Hashable, tuple[asyncio.Lock, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @contextlib.asynccontextmanager
+    async def hold(self, key: Hashable) -> AsyncIterator[None]:
+        lock, users = self._locks.get(key, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._locks[key] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._locks[key]
+            if users == 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, users - 1)
+
+
+idempotency_locks = KeyLocks()
@@ -1,9 +1,22 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
 from uuid import uuid4, UUID
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index, func, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from src.database.base_models import Base
+from src.database.field_typing import JSON_type, str_32, str_64, str_255
+
+
+class OrderStatus(str, Enum):
+    PENDING = 'pending'  # сохранён, ждёт отправки воркером в TapBank
+    SUBMITTING = 'submitting'  # отправляется в TapBank
+    SUBMITTED = 'submitted'  # TapBank вернул реквизиты
+    FAILED = 'failed'  # отправить не удалось, баланс возвращён
+    COMPLETED = 'completed'  # TapBank подтвердил оплату (callback)
+    CANCELED = 'canceled'  # TapBank отменил заказ (callback), баланс возвращён
 
 
 class Order(Base):
@@ -12,3 +25,49 @@ class Order(Base):
     id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid4)
     user_id: Mapped[UUID] = mapped_column(ForeignKey('user.id'))
     amount: Mapped[float]
+    status: Mapped[str_32] = mapped_column(default=OrderStatus.PENDING.value, server_default=OrderStatus.SUBMITTED.value)
+    payload: Mapped[JSON_type]
+    requisites: Mapped[JSON_type]
+    error: Mapped[Optional[str]]
+    submit_attempts: Mapped[int] = mapped_column(default=0, server_default='0')
+    external_id: Mapped[Optional[str_255]] = mapped_column(unique=True)
+    created_at: Mapped[datetime] = mapped_column(server_default=func.now())
+    # Время последнего изменения: по нему находятся заказы, зависшие в submitting
+    updated_at: Mapped[datetime] = mapped_column(server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index('ix_order_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+        Index(
+            'ix_order_submitting_updated_at',
+            'updated_at',
+            postgresql_where=text(f"status = '{OrderStatus.SUBMITTING.value}'")
+        ),
+    )
+
+
+class OrderCallbackEvent(Base):
+    """Таблица идемпотентности callback'ов TapBank: повторная доставка отсекается по первичному ключу."""
+    __tablename__ = 'order_callback_event'
+
+    event_id: Mapped[str_255] = mapped_column(primary_key=True)
+    order_external_id: Mapped[str_255]
+    status: Mapped[str_32]
+    received_at: Mapped[datetime] = mapped_column(server_default=func.now())
+
+
+class IdempotencyKey(Base):
+    """
+    Ответы /create_order по заголовку Idempotency-Key.
+    Пока запрос выполняется, status_code пуст: повтор с тем же ключом ждёт его завершения.
+    Ключи старше IDEMPOTENCY_KEY_TTL удаляет IdempotencyKeyCleaner.
+    """
+    __tablename__ = 'idempotency_key'
+
+    user_id: Mapped[UUID] = mapped_column(ForeignKey('user.id'), primary_key=True)
+    key: Mapped[str_255] = mapped_column(primary_key=True)
+    request_hash: Mapped[str_64]
+    status_code: Mapped[Optional[int]]
+    content_type: Mapped[Optional[str_255]]
+    body: Mapped[Optional[bytes]]
+    order_id: Mapped[Optional[UUID]]
+    created_at: Mapped[datetime] = mapped_column(server_default=func.now(), index=True)
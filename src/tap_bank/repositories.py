@@ -1,6 +1,162 @@
+from datetime import timedelta
+from typing import Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy import delete, func, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import defer
+
 from src.tap_bank import models
 from src.base.repository import BaseRepository
 
 
 class OrderRepository(BaseRepository[models.Order]):
     model = models.Order
+
+    async def get_user_order(self, user_id, order_id) -> Optional[models.Order]:
+        query = select(self.model).where(self.model.id == order_id, self.model.user_id == user_id)
+        return await self.session.scalar(query)
+
+    async def get_user_orders_page(self, user_id, limit: int, cursor: Optional[str] = None):
+        query = select(self.model).where(self.model.user_id == user_id).options(defer(self.model.payload))
+        return await self.keyset_page(query, limit, cursor, column_names=('created_at', 'id'), descending=True)
+
+    async def get_pending_ids(self, limit: int) -> Iterable[UUID]:
+        query = (
+            select(self.model.id)
+            .where(self.model.status == models.OrderStatus.PENDING.value)
+            .limit(limit)
+        )
+        result = await self.session.scalars(query)
+        return result.all()
+
+    async def claim_pending(self, order_id) -> Optional[models.Order]:
+        """
+        Переводит заказ из pending в submitting одним UPDATE.
+        Если заказ уже забрал другой воркер (в т.ч. в другом процессе), вернёт None.
+        """
+        query = (
+            update(self.model)
+            .where(self.model.id == order_id, self.model.status == models.OrderStatus.PENDING.value)
+            .values(status=models.OrderStatus.SUBMITTING.value)
+            .returning(self.model)
+        )
+        return await self.session.scalar(query)
+
+    async def requeue_stale(self, stale_after: timedelta, limit: int) -> list[UUID]:
+        """
+        Возвращает в pending заказы, которые дольше stale_after находятся в submitting:
+        воркер, отправлявший их, упал или был остановлен. Заказы, захваченные другим процессом, пропускаются.
+        """
+        stale = (
+            select(self.model.id)
+            .where(
+                self.model.status == models.OrderStatus.SUBMITTING.value,
+                self.model.updated_at < func.now() - stale_after,
+            )
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        query = (
+            update(self.model)
+            .where(self.model.id.in_(stale))
+            .values(status=models.OrderStatus.PENDING.value)
+            .returning(self.model.id)
+            .execution_options(synchronize_session=False)
+        )
+        result = await self.session.scalars(query)
+        return list(result.all())
+
+    async def update(self, order_id, data: dict) -> None:
+        query = update(self.model).where(self.model.id == order_id).values(**data)
+        await self.session.execute(query)
+
+    async def update_many(self, rows: list[dict]) -> None:
+        """Обновляет заказы по id одним executemany, в каждой строке обязателен ключ id."""
+        if rows:
+            await self.session.execute(update(self.model), rows)
+
+    async def transition_status(self, external_id: str, status: str, from_statuses: Iterable[str]):
+        """Меняет статус заказа, только если текущий статус входит в from_statuses. Возвращает (id, user_id, amount)."""
+        query = (
+            update(self.model)
+            .where(self.model.external_id == external_id, self.model.status.in_(list(from_statuses)))
+            .values(status=status)
+            .returning(self.model.id, self.model.user_id, self.model.amount)
+        )
+        result = await self.session.execute(query)
+        return result.one_or_none()
+
+    async def exists_by_external_id(self, external_id: str) -> bool:
+        query = select(self.model.id).where(self.model.external_id == external_id)
+        return await self.session.scalar(query) is not None
+
+
+class OrderCallbackEventRepository(BaseRepository[models.OrderCallbackEvent]):
+    model = models.OrderCallbackEvent
+
+    async def insert_new(self, events: list[dict]) -> set[str]:
+        """
+        Вставляет события одним INSERT ... ON CONFLICT DO NOTHING.
+        Возвращает event_id только реально вставленных (не повторных) событий.
+        """
+        if not events:
+            return set()
+        query = (
+            insert(self.model)
+            .values(events)
+            .on_conflict_do_nothing(index_elements=[self.model.event_id])
+            .returning(self.model.event_id)
+        )
+        result = await self.session.scalars(query)
+        return set(result.all())
+
+    async def delete_many(self, event_ids: Iterable[str]) -> None:
+        event_ids = list(event_ids)
+        if event_ids:
+            await self.session.execute(delete(self.model).where(self.model.event_id.in_(event_ids)))
+
+
+class IdempotencyKeyRepository(BaseRepository[models.IdempotencyKey]):
+    model = models.IdempotencyKey
+
+    async def get_by_key(self, user_id, key: str, pending_timeout: timedelta):
+        """Возвращает (ключ, брошен ли он): брошенным считается незавершённый ключ старше pending_timeout."""
+        query = (
+            select(self.model, (self.model.created_at < func.now() - pending_timeout).label('abandoned'))
+            .where(self.model.user_id == user_id, self.model.key == key)
+        )
+        result = await self.session.execute(query)
+        return result.one_or_none()
+
+    async def reserve(self, user_id, key: str, request_hash: str) -> bool:
+        """
+        Занимает ключ INSERT ... ON CONFLICT DO NOTHING. Возвращает False, если ключ уже занят.
+        Если ключ занят ещё не зафиксированной транзакцией, запрос ждёт её завершения.
+        """
+        query = (
+            insert(self.model)
+            .values(user_id=user_id, key=key, request_hash=request_hash)
+            .on_conflict_do_nothing(index_elements=[self.model.user_id, self.model.key])
+            .returning(self.model.key)
+        )
+        return await self.session.scalar(query) is not None
+
+    async def complete(self, user_id, key: str, data: dict) -> None:
+        query = update(self.model).where(self.model.user_id == user_id, self.model.key == key).values(**data)
+        await self.session.execute(query)
+
+    async def release(self, user_id, key: str) -> None:
+        await self.session.execute(delete(self.model).where(self.model.user_id == user_id, self.model.key == key))
+
+    async def delete_expired(self, ttl: timedelta, limit: int) -> int:
+        """Удаляет до limit ключей старше ttl, возвращает количество удалённых."""
+        expired = (
+            select(self.model.user_id, self.model.key)
+            .where(self.model.created_at < func.now() - ttl)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        query = delete(self.model).where(tuple_(self.model.user_id, self.model.key).in_(expired))
+        result = await self.session.execute(query)
+        return result.rowcount
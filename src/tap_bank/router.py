@@ -1,33 +1,72 @@
-from typing import Annotated
+import asyncio
+import functools
+import hashlib
+import time
+from typing import Annotated, Awaitable, Callable, Optional
+from uuid import UUID
 
-import aiohttp
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.tap_bank.dependencies import get_order_service
-from src.tap_bank.service import OrderService
+from src.config import Config, get_config
+from src.database.session import get_async_session
+from src.tap_bank.client import TapBankClient, TapBankResponse
+from src.tap_bank.idempotency import idempotency_locks
+from src.tap_bank.dependencies import (
+    get_callback_processor,
+    get_idempotency_service,
+    get_order_service,
+    get_order_submitter,
+    get_read_order_service,
+    get_tap_bank_client,
+    verify_callback
+)
+from src.tap_bank.models import Order, OrderStatus
+from src.tap_bank.service import IdempotencyService, OrderService
 from src.users.dependencies import get_user_service
 from src.users.service import UserService
 from src.utils.exceptions import CustomHTTPException
+from src.utils.rate_limit import RateLimit, check_rate_limit, global_key
+from src.utils.responses import ORJSONResponse
 from src.users.models import User
-from src.users.utils import CurrentUserChecker
-from src.config import get_config
-from src.tap_bank.schemas import OrderRequest as OrderRequestSchema
+from src.users.utils import CurrentUserChecker, user_or_ip_key
+from src.tap_bank.schemas import (
+    Order as OrderSchema,
+    OrderBatchRequest as OrderBatchRequestSchema,
+    OrderBatchResult as OrderBatchResultSchema,
+    OrderCallback as OrderCallbackSchema,
+    OrderPage as OrderPageSchema,
+    OrderRequest as OrderRequestSchema
+)
+from src.tap_bank.workers import CallbackProcessor, OrderSubmitter
 
 tap_bank_route = APIRouter()
-config = get_config()
 
-HEADERS = {'Authorization': 'Bearer ' + config.TAP_BANK_API_TOKEN}
+trade_methods_rate_limits = [Depends(RateLimit('trade_methods', key=user_or_ip_key))]
+tap_bank_rate_limit = Depends(RateLimit('tap_bank', key=global_key))
 
 
-@tap_bank_route.get('/trade-methods/payout', tags=['Trade methods'], status_code=status.HTTP_200_OK)
+def _passthrough(tap_bank_response: TapBankResponse) -> Response:
+    """Отдаёт ответ TapBank клиенту как есть, без разбора и повторной сериализации JSON."""
+    return Response(
+        content=tap_bank_response.body,
+        status_code=tap_bank_response.status,
+        media_type=tap_bank_response.content_type
+    )
+
+
+@tap_bank_route.get(
+    '/trade-methods/payout',
+    tags=['Trade methods'],
+    status_code=status.HTTP_200_OK,
+    dependencies=trade_methods_rate_limits
+)
 async def payout(
         current_user: Annotated[User, Depends(CurrentUserChecker())],
+        tap_bank_client: Annotated[TapBankClient, Depends(get_tap_bank_client)],
 ):
-    url = f'{config.TAP_BANK_BASE_URL}/public/api/v1/shop/trade-methods/payout'
     try:
-        async with aiohttp.ClientSession() as client:
-            async with client.get(url, headers=HEADERS) as response:
-                return await response.json()
+        return _passthrough(await tap_bank_client.get_payout_methods())
     except CustomHTTPException as error:
         raise HTTPException(
             status_code=error.status_code,
@@ -35,15 +74,18 @@ async def payout(
         )
 
 
-@tap_bank_route.get('/trade-methods/payin', tags=['Trade methods'], status_code=status.HTTP_200_OK)
+@tap_bank_route.get(
+    '/trade-methods/payin',
+    tags=['Trade methods'],
+    status_code=status.HTTP_200_OK,
+    dependencies=trade_methods_rate_limits
+)
 async def payin(
         current_user: Annotated[User, Depends(CurrentUserChecker())],
+        tap_bank_client: Annotated[TapBankClient, Depends(get_tap_bank_client)],
 ):
-    url = f'{config.TAP_BANK_BASE_URL}/public/api/v1/shop/trade-methods'
     try:
-        async with aiohttp.ClientSession() as client:
-            async with client.get(url, headers=HEADERS) as response:
-                return await response.json()
+        return _passthrough(await tap_bank_client.get_payin_methods())
     except CustomHTTPException as error:
         raise HTTPException(
             status_code=error.status_code,
@@ -51,40 +93,257 @@ async def payin(
         )
 
 
-@tap_bank_route.post('/create_order', tags=['Orders'], status_code=status.HTTP_200_OK)
+@tap_bank_route.post(
+    '/create_order',
+    tags=['Orders'],
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(RateLimit('orders', key=user_or_ip_key)), tap_bank_rate_limit]
+)
 async def create_order(
         order: OrderRequestSchema,
         current_user: Annotated[User, Depends(CurrentUserChecker())],
         user_service: Annotated[UserService, Depends(get_user_service)],
         order_service: Annotated[OrderService, Depends(get_order_service)],
+        idempotency_service: Annotated[IdempotencyService, Depends(get_idempotency_service)],
+        tap_bank_client: Annotated[TapBankClient, Depends(get_tap_bank_client)],
+        order_submitter: Annotated[OrderSubmitter, Depends(get_order_submitter)],
+        session: Annotated[AsyncSession, Depends(get_async_session)],
+        config: Annotated[Config, Depends(get_config)],
+        idempotency_key: Annotated[Optional[str], Header(alias='Idempotency-Key', max_length=255)] = None,
+        async_submit: bool = False,
+):
+    """
+    При async_submit=true заказ сохраняется в статусе pending и сразу возвращается клиенту,
+    а в TapBank его отправляет фоновый воркер. Результат можно получить через GET /orders/{order_id}.
+
+    С заголовком Idempotency-Key повтор того же запроса возвращает сохранённый ответ
+    (с заголовком Idempotent-Replayed) без повторного списания и запроса в TapBank.
+    Пока исходный запрос выполняется в другом процессе, повтор ждёт его ответа до IDEMPOTENCY_WAIT_TIMEOUT
+    секунд, затем получает 409. Если исходный запрос не завершился за IDEMPOTENCY_PENDING_TIMEOUT
+    (процесс упал), повтор получает текущее состояние созданного заказа.
+    """
+    create = functools.partial(
+        _create_order,
+        order=order,
+        current_user=current_user,
+        user_service=user_service,
+        order_service=order_service,
+        tap_bank_client=tap_bank_client,
+        order_submitter=order_submitter,
+        session=session,
+        async_submit=async_submit,
+    )
+    if idempotency_key is None:
+        return await create()
+
+    request_hash = hashlib.sha256(f'{order.model_dump_json()}|{async_submit}'.encode()).hexdigest()
+    async with idempotency_locks.hold((current_user.id, idempotency_key)):
+        deadline = time.monotonic() + config.IDEMPOTENCY_WAIT_TIMEOUT
+        while True:
+            stored = await idempotency_service.get(
+                current_user.id, idempotency_key, config.IDEMPOTENCY_PENDING_TIMEOUT
+            )
+            if stored is None:
+                if await idempotency_service.reserve(current_user.id, idempotency_key, request_hash):
+                    break
+                # Ключ одновременно занял запрос в другом процессе
+                continue
+            if stored.request_hash != request_hash:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                    detail='Idempotency-Key was already used with a different request'
+                )
+            if stored.completed:
+                return stored.to_response()
+            if stored.abandoned:
+                # Исходный запрос не завершился (процесс упал после создания заказа):
+                # отвечаем текущим состоянием заказа, дальше его ведут воркеры.
+                if stored.order_id is None:
+                    await idempotency_service.release(current_user.id, idempotency_key)
+                    await session.commit()
+                    continue
+                response = ORJSONResponse(OrderSchema.model_validate(await order_service.get_one(stored.order_id)))
+                await idempotency_service.complete(current_user.id, idempotency_key, request_hash, response)
+                return response
+            if time.monotonic() >= deadline:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail='Request with this Idempotency-Key is in progress',
+                    headers={'Retry-After': '1'}
+                )
+            # Исходный запрос выполняется в другом процессе: ждём его ответа, не держа соединение с БД
+            await session.commit()
+            await asyncio.sleep(config.IDEMPOTENCY_WAIT_INTERVAL)
+
+        # Ключ вставлен в транзакцию заказа и фиксируется вместе со списанием
+        try:
+            response = await create(
+                on_created=lambda new_order: idempotency_service.attach_order(
+                    current_user.id, idempotency_key, new_order.id
+                )
+            )
+        except HTTPException:
+            # Заказ не создан или уже отменён с возвратом суммы: ключ освобождается, повтор выполнится заново.
+            # При непредвиденной ошибке ключ остаётся занятым, так как неизвестно, дошёл ли заказ до TapBank.
+            await session.rollback()
+            await idempotency_service.release(current_user.id, idempotency_key)
+            await session.commit()
+            raise
+        await idempotency_service.complete(current_user.id, idempotency_key, request_hash, response)
+        return response
+
+
+async def _create_order(
+        order: OrderRequestSchema,
+        current_user: User,
+        user_service: UserService,
+        order_service: OrderService,
+        tap_bank_client: TapBankClient,
+        order_submitter: OrderSubmitter,
+        session: AsyncSession,
+        async_submit: bool,
+        on_created: Optional[Callable[[Order], Awaitable[None]]] = None,
+) -> Response:
+    if async_submit and not order_submitter.can_accept():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='Order queue is full, try again later'
+        )
+
+    try:
+        new_order = await order_service.create_order(
+            current_user=current_user,
+            new_order=order,
+            user_service=user_service,
+            status=OrderStatus.PENDING if async_submit else OrderStatus.SUBMITTING,
+        )
+    except CustomHTTPException as error:
+        raise HTTPException(
+            status_code=error.status_code,
+            detail=str(error)
+        )
+    if on_created is not None:
+        await on_created(new_order)
+
+    # Резерв суммы фиксируется сразу: блокировка строки пользователя не держится на время запроса в TapBank,
+    # а воркер читает заказ в своей транзакции.
+    await session.commit()
+
+    if async_submit:
+        order_submitter.submit(new_order.id)
+        return ORJSONResponse(OrderSchema.model_validate(new_order), status_code=status.HTTP_202_ACCEPTED)
+
+    try:
+        tap_bank_response = await tap_bank_client.create_sync_requisites(new_order.payload, raise_for_status=True)
+        requisites = tap_bank_response.json()
+    except CustomHTTPException as error:
+        await order_service.fail_order(new_order, error=str(error), attempts=1, user_service=user_service)
+        await session.commit()
+        raise HTTPException(
+            status_code=error.status_code,
+            detail=str(error)
+        )
+    await order_service.mark_submitted(new_order.id, requisites)
+    return _passthrough(tap_bank_response)
+
+
+@tap_bank_route.post(
+    '/create_orders',
+    tags=['Orders'],
+    status_code=status.HTTP_200_OK,
+    response_model=OrderBatchResultSchema,
+    dependencies=[Depends(RateLimit('order_batches', key=user_or_ip_key))]
+)
+async def create_orders(
+        request: Request,
+        batch: OrderBatchRequestSchema,
+        response: Response,
+        current_user: Annotated[User, Depends(CurrentUserChecker())],
+        user_service: Annotated[UserService, Depends(get_user_service)],
+        order_service: Annotated[OrderService, Depends(get_order_service)],
+        tap_bank_client: Annotated[TapBankClient, Depends(get_tap_bank_client)],
+        order_submitter: Annotated[OrderSubmitter, Depends(get_order_submitter)],
+        session: Annotated[AsyncSession, Depends(get_async_session)],
+        config: Annotated[Config, Depends(get_config)],
+        async_submit: bool = False,
+):
+    """
+    Создаёт несколько заказов за один запрос: общая сумма списывается с баланса одним UPDATE,
+    заказы вставляются одним INSERT. Результат возвращается по каждому заказу в порядке запроса,
+    неотправленные заказы получают статус failed, их сумма возвращается на баланс.
+    При async_submit=true заказы отправляет в TapBank фоновый воркер, как в /create_order.
+    """
+    if len(batch.orders) > config.ORDER_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Too many orders in batch, max {config.ORDER_BATCH_MAX_SIZE}'
+        )
+    # Каждый заказ пачки - отдельный запрос в TapBank
+    await check_rate_limit(request, 'tap_bank', global_key(request), cost=len(batch.orders))
+    if async_submit and not order_submitter.can_accept(len(batch.orders)):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='Order queue is full, try again later'
+        )
+
+    try:
+        orders = await order_service.create_orders(
+            current_user=current_user,
+            new_orders=batch.orders,
+            user_service=user_service,
+            status=OrderStatus.PENDING if async_submit else OrderStatus.SUBMITTING,
+        )
+    except CustomHTTPException as error:
+        raise HTTPException(
+            status_code=error.status_code,
+            detail=str(error)
+        )
+    # Списание и заказы фиксируются до обращения к TapBank, чтобы не держать транзакцию на время запросов.
+    await session.commit()
+
+    if async_submit:
+        for order in orders:
+            order_submitter.submit(order.id)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {'items': [
+            {'index': index, 'order_id': order.id, 'status': order.status}
+            for index, order in enumerate(orders)
+        ]}
 
+    items = await order_service.submit_orders(
+        orders,
+        tap_bank_client=tap_bank_client,
+        user_service=user_service,
+        concurrency=config.ORDER_BATCH_CONCURRENCY,
+    )
+    return {'items': items}
+
+
+@tap_bank_route.get('/orders', tags=['Orders'], status_code=status.HTTP_200_OK, response_model=OrderPageSchema)
+async def get_orders(
+        current_user: Annotated[User, Depends(CurrentUserChecker())],
+        order_service: Annotated[OrderService, Depends(get_read_order_service)],
+        limit: Annotated[int, Query(ge=1, le=100)] = 20,
+        cursor: Optional[str] = None,
 ):
-    await order_service.create_order(current_user=current_user, new_order=order, user_service=user_service)
-    url = f'{config.TAP_BANK_BASE_URL}/public/api/v1/shop/orders/sync-requisites'
-    data = {
-      'amount': int(order.amount),
-      'currency': order.currency,
-      'customer': {
-        'id': str(current_user.id),
-        'phone': current_user.phone,
-        'name': f'{current_user.last_name} {current_user.first_name}',
-        'email': current_user.email
-      },
-      'integration': {
-        'callbackUrl': '',  # f'https://{config.API_HOST}:{config.API_PORT}/order_callback',
-        'callbackMethod': 'post',
-        'returnUrl': 'https://your-shop.com'
-      },
-      'payment': {
-        'type': order.payment.type,
-        'bank': order.payment.bank
-      }
-    }
+    """Заказы текущего пользователя от новых к старым. Для следующей страницы передайте next_cursor."""
     try:
-        async with aiohttp.ClientSession() as client:
-            async with client.post(url, headers=HEADERS, json=data) as response:
-                return await response.json()
+        return await order_service.get_user_orders(current_user, limit, cursor)
+    except CustomHTTPException as error:
+        raise HTTPException(
+            status_code=error.status_code,
+            detail=str(error)
+        )
 
+
+@tap_bank_route.get('/orders/{order_id}', tags=['Orders'], status_code=status.HTTP_200_OK, response_model=OrderSchema)
+async def get_order(
+        order_id: UUID,
+        current_user: Annotated[User, Depends(CurrentUserChecker())],
+        order_service: Annotated[OrderService, Depends(get_order_service)],
+):
+    try:
+        return await order_service.get_user_order(current_user, order_id)
     except CustomHTTPException as error:
         raise HTTPException(
             status_code=error.status_code,
@@ -92,9 +351,21 @@ async def create_order(
         )
 
 
-@tap_bank_route.post('/order_callback', tags=['Orders'], status_code=status.HTTP_200_OK)
+@tap_bank_route.post(
+    '/order_callback',
+    tags=['Orders'],
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(verify_callback)]
+)
 async def callback(
-        data: dict
+        data: OrderCallbackSchema,
+        callback_processor: Annotated[CallbackProcessor, Depends(get_callback_processor)],
 ):
-    # делай с callback то что нужно
-    return data
+    result = await callback_processor.process(data)
+    if result == 'unknown_order':
+        # TapBank повторит доставку, к этому моменту заказ уже будет сохранён
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f'Order {data.id} not found'
+        )
+    return ORJSONResponse({'status': result})
@@ -1,4 +1,8 @@
-from pydantic import BaseModel as BaseScheme
+from datetime import datetime
+from typing import Optional, Union
+from uuid import UUID
+
+from pydantic import BaseModel as BaseScheme, ConfigDict, Field
 
 
 class Payment(BaseScheme):
@@ -10,3 +14,48 @@ class OrderRequest(BaseScheme):
     amount: float
     currency: str
     payment: Payment
+
+
+class OrderBatchRequest(BaseScheme):
+    orders: list[OrderRequest] = Field(min_length=1)
+
+
+class Order(BaseScheme):
+    id: UUID
+    amount: float
+    status: str
+    requisites: Optional[Union[dict, list]] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class OrderPage(BaseScheme):
+    items: list[Order]
+    next_cursor: Optional[str] = None
+
+
+class OrderBatchItem(BaseScheme):
+    index: int  # позиция заказа в запросе
+    order_id: UUID
+    status: str
+    requisites: Optional[Union[dict, list]] = None
+    error: Optional[str] = None
+
+
+class OrderBatchResult(BaseScheme):
+    items: list[OrderBatchItem]
+
+
+class OrderCallback(BaseScheme):
+    id: str  # id заказа в TapBank
+    status: str
+    event_id: Optional[str] = Field(default=None, alias='eventId')
+
+    model_config = ConfigDict(extra='allow', populate_by_name=True)
+
+    @property
+    def idempotency_key(self) -> str:
+        # Если TapBank не прислал id события, повтором считается тот же статус того же заказа.
+        return self.event_id or f'{self.id}:{self.status}'
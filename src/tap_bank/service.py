@@ -1,20 +1,279 @@
+import asyncio
+from datetime import timedelta
+from typing import Any, Optional
+
+from fastapi import Response
+
 from src.base.service import BaseService
-from src.tap_bank.repositories import OrderRepository
+from src.tap_bank.client import TapBankClient
+from src.tap_bank.idempotency import StoredResponse, cache_response, idempotency_cache
+from src.tap_bank.repositories import IdempotencyKeyRepository, OrderRepository
 from src.tap_bank import models as tap_bank_models
+from src.tap_bank.models import OrderStatus
 from src.tap_bank.schemas import OrderRequest as NewOrder
 from src.users.models import User
 from src.users.service import UserService
 from src.utils.exceptions import CustomHTTPException
+from src.utils.money import to_minor
+
+
+# Статусы TapBank из callback'ов, которые переводят заказ в финальное состояние.
+TAP_BANK_FINAL_STATUSES = {
+    'success': OrderStatus.COMPLETED,
+    'completed': OrderStatus.COMPLETED,
+    'paid': OrderStatus.COMPLETED,
+    'failed': OrderStatus.CANCELED,
+    'canceled': OrderStatus.CANCELED,
+    'cancelled': OrderStatus.CANCELED,
+    'expired': OrderStatus.CANCELED,
+    'rejected': OrderStatus.CANCELED,
+}
+
+
+def build_order_payload(current_user: User, new_order: NewOrder) -> dict:
+    return {
+      'amount': int(new_order.amount),
+      'currency': new_order.currency,
+      'customer': {
+        'id': str(current_user.id),
+        'phone': current_user.phone,
+        'name': f'{current_user.last_name} {current_user.first_name}',
+        'email': current_user.email
+      },
+      'integration': {
+        'callbackUrl': '',  # f'https://{config.API_HOST}:{config.API_PORT}/order_callback',
+        'callbackMethod': 'post',
+        'returnUrl': 'https://your-shop.com'
+      },
+      'payment': {
+        'type': new_order.payment.type,
+        'bank': new_order.payment.bank
+      }
+    }
+
+
+def _external_id(requisites: Any) -> Optional[str]:
+    return str(requisites['id']) if isinstance(requisites, dict) and requisites.get('id') else None
 
 
 class OrderService(BaseService[OrderRepository, tap_bank_models.Order]):
 
-    async def create_order(self, current_user: User, new_order: NewOrder, user_service: UserService):
-        if current_user.balance < new_order.amount:
-            raise CustomHTTPException('User balance < order amount', status_code=400)
+    async def create_order(
+            self,
+            current_user: User,
+            new_order: NewOrder,
+            user_service: UserService,
+            status: OrderStatus = OrderStatus.SUBMITTING,
+    ):
+        # Заказ вставляется до резерва суммы: строка пользователя блокируется последним запросом
+        # перед коммитом. Условие balance >= amount проверяется самим UPDATE, без чтения баланса в Python.
         order = await self.repository.create({
             'user_id': current_user.id,
-            'amount': new_order.amount
+            'amount': new_order.amount,
+            'status': status.value,
+            'payload': build_order_payload(current_user, new_order),
         })
-        user = await user_service.update(current_user, {'balance': current_user.balance - new_order.amount})
+        if order is None:
+            raise CustomHTTPException('Order was not created', status_code=400)
+        new_balance = await user_service.debit_balance(current_user.id, {order.id: to_minor(order.amount)})
+        if new_balance is None:
+            raise CustomHTTPException('User balance < order amount', status_code=400)
         return order
+
+    async def create_orders(
+            self,
+            current_user: User,
+            new_orders: list[NewOrder],
+            user_service: UserService,
+            status: OrderStatus = OrderStatus.SUBMITTING,
+    ) -> list[tap_bank_models.Order]:
+        """Создаёт заказы одним многострочным INSERT и резервирует их общую сумму одним UPDATE."""
+        orders = await self.repository.create_many([
+            {
+                'user_id': current_user.id,
+                'amount': new_order.amount,
+                'status': status.value,
+                'payload': build_order_payload(current_user, new_order),
+            }
+            for new_order in new_orders
+        ])
+        if not orders:
+            raise CustomHTTPException('Orders were not created', status_code=400)
+        new_balance = await user_service.debit_balance(
+            current_user.id,
+            {order.id: to_minor(order.amount) for order in orders}
+        )
+        if new_balance is None:
+            raise CustomHTTPException('User balance < orders total amount', status_code=400)
+        return orders
+
+    async def submit_orders(
+            self,
+            orders: list[tap_bank_models.Order],
+            tap_bank_client: TapBankClient,
+            user_service: UserService,
+            concurrency: int,
+    ) -> list[dict]:
+        """
+        Отправляет заказы в TapBank, не более concurrency запросов одновременно.
+        Результаты сохраняются одним executemany, возвраты неотправленных заказов - одним INSERT в журнал баланса.
+
+        Return:
+        - list[dict]: результат по каждому заказу в порядке orders.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def submit(order: tap_bank_models.Order) -> tuple[Any, Optional[str]]:
+            async with semaphore:
+                try:
+                    response = await tap_bank_client.create_sync_requisites(order.payload, raise_for_status=True)
+                    return response.json(), None
+                except CustomHTTPException as error:
+                    return None, str(error)
+
+        outcomes = await asyncio.gather(*(submit(order) for order in orders))
+
+        results, updates, refunds = [], [], []
+        for index, (order, (requisites, error)) in enumerate(zip(orders, outcomes)):
+            if error is None:
+                status = OrderStatus.SUBMITTED
+                updates.append({
+                    'id': order.id,
+                    'status': status.value,
+                    'requisites': requisites,
+                    'submit_attempts': 1,
+                    'external_id': _external_id(requisites),
+                })
+            else:
+                status = OrderStatus.FAILED
+                updates.append({'id': order.id, 'status': status.value, 'error': error, 'submit_attempts': 1})
+                refunds.append((order.user_id, order.id, to_minor(order.amount)))
+            results.append({
+                'index': index,
+                'order_id': order.id,
+                'status': status.value,
+                'requisites': requisites,
+                'error': error,
+            })
+
+        await self.repository.update_many(updates)
+        await user_service.credit_balance(refunds)
+        return results
+
+    async def get_user_order(self, current_user: User, order_id) -> tap_bank_models.Order:
+        order = await self.repository.get_user_order(current_user.id, order_id)
+        if order is None:
+            raise CustomHTTPException(f'Order {order_id} not found', status_code=404)
+        return order
+
+    async def get_user_orders(self, current_user: User, limit: int, cursor: Optional[str] = None) -> dict:
+        try:
+            items, next_cursor = await self.repository.get_user_orders_page(current_user.id, limit, cursor)
+        except ValueError as error:
+            raise CustomHTTPException(str(error), status_code=400)
+        return {'items': items, 'next_cursor': next_cursor}
+
+    async def get_pending_ids(self, limit: int):
+        return await self.repository.get_pending_ids(limit)
+
+    async def requeue_stale(self, stale_after: float, limit: int) -> list:
+        return await self.repository.requeue_stale(timedelta(seconds=stale_after), limit)
+
+    async def claim_pending(self, order_id) -> Optional[tap_bank_models.Order]:
+        return await self.repository.claim_pending(order_id)
+
+    async def mark_submitted(self, order_id, requisites: Any, attempts: int = 1) -> None:
+        await self.repository.update(order_id, {
+            'status': OrderStatus.SUBMITTED.value,
+            'requisites': requisites,
+            'submit_attempts': attempts,
+            'external_id': _external_id(requisites),
+        })
+
+    async def fail_order(self, order: tap_bank_models.Order, error: str, attempts: int, user_service: UserService) -> None:
+        await self.repository.update(order.id, {
+            'status': OrderStatus.FAILED.value,
+            'error': error,
+            'submit_attempts': attempts,
+        })
+        await user_service.credit_balance([(order.user_id, order.id, to_minor(order.amount))])
+
+    async def apply_callback(self, external_id: str, tap_bank_status: str) -> tuple[str, Optional[tuple]]:
+        """
+        Применяет статус из callback'а TapBank к заказу.
+
+        Return:
+        - ('applied', (order_id, user_id, refund_amount)) - статус изменён, refund_amount в копейках > 0, если нужен возврат;
+        - ('ignored', None) - статус не финальный или заказ уже в финальном состоянии;
+        - ('unknown_order', None) - заказа с таким external_id (ещё) нет.
+        """
+        new_status = TAP_BANK_FINAL_STATUSES.get(tap_bank_status.lower())
+        if new_status is None:
+            return 'ignored', None
+
+        row = await self.repository.transition_status(
+            external_id,
+            new_status.value,
+            from_statuses=[OrderStatus.SUBMITTED.value]
+        )
+        if row is None:
+            if await self.repository.exists_by_external_id(external_id):
+                return 'ignored', None
+            return 'unknown_order', None
+
+        refund = to_minor(row.amount) if new_status == OrderStatus.CANCELED else 0
+        return 'applied', (row.id, row.user_id, refund)
+
+
+class IdempotencyService(BaseService[IdempotencyKeyRepository, tap_bank_models.IdempotencyKey]):
+
+    async def get(self, user_id, key: str, pending_timeout: float) -> Optional[StoredResponse]:
+        """
+        Сохранённый ответ: сначала из кэша процесса, затем из БД.
+        Незавершённый ключ старше pending_timeout секунд помечается брошенным (abandoned).
+        """
+        stored = idempotency_cache.get((user_id, key))
+        if stored is not None:
+            return stored
+
+        row = await self.repository.get_by_key(user_id, key, timedelta(seconds=pending_timeout))
+        if row is None:
+            return None
+        idempotency_key, abandoned = row
+        stored = StoredResponse(
+            request_hash=idempotency_key.request_hash,
+            status_code=idempotency_key.status_code,
+            content_type=idempotency_key.content_type,
+            body=idempotency_key.body,
+            order_id=idempotency_key.order_id,
+            abandoned=abandoned and idempotency_key.status_code is None,
+        )
+        if stored.completed:
+            cache_response((user_id, key), stored)
+        return stored
+
+    async def reserve(self, user_id, key: str, request_hash: str) -> bool:
+        return await self.repository.reserve(user_id, key, request_hash)
+
+    async def attach_order(self, user_id, key: str, order_id) -> None:
+        await self.repository.complete(user_id, key, {'order_id': order_id})
+
+    async def complete(self, user_id, key: str, request_hash: str, response: Response) -> None:
+        stored = StoredResponse(
+            request_hash=request_hash,
+            status_code=response.status_code,
+            content_type=response.headers.get('content-type'),
+            body=bytes(response.body),
+        )
+        await self.repository.complete(user_id, key, {
+            'status_code': stored.status_code,
+            'content_type': stored.content_type,
+            'body': stored.body,
+        })
+        cache_response((user_id, key), stored)
+
+    async def release(self, user_id, key: str) -> None:
+        await self.repository.release(user_id, key)
+
+    async def delete_expired(self, ttl: float, limit: int) -> int:
+        return await self.repository.delete_expired(timedelta(seconds=ttl), limit)
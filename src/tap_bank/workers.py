@@ -0,0 +1,392 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Optional
+
+from src.config import Config
+from src.database.session import DataBaseSessionManager
+from src.tap_bank.client import TapBankClient, TapBankError
+from src.tap_bank.repositories import IdempotencyKeyRepository, OrderCallbackEventRepository, OrderRepository
+from src.tap_bank.schemas import OrderCallback
+from src.tap_bank.service import IdempotencyService, OrderService
+from src.users.repositories import UserRepository
+from src.users.service import UserService
+from src.utils.cache import ExpiringLRUCache
+from src.utils.exceptions import CustomHTTPException
+
+
+class OrderSubmitter:
+    """
+    Пул фоновых воркеров, отправляющих pending-заказы в TapBank.
+
+    Заказ забирается воркером атомарным UPDATE pending -> submitting, поэтому один и тот же заказ
+    не будет отправлен дважды даже при нескольких процессах. Сессия БД не держится во время
+    запроса в TapBank: захват заказа и сохранение результата выполняются в отдельных транзакциях.
+
+    Сумма заказа списана до отправки, поэтому заказы, зависшие в submitting после падения или остановки
+    процесса, раз в ORDER_SUBMIT_RECOVERY_INTERVAL секунд возвращаются в pending и отправляются заново.
+    Если при старте pending-заказы не удалось загрузить (например, БД недоступна), их ставит в очередь тот же цикл.
+    """
+
+    def __init__(
+            self,
+            config: Config,
+            tap_bank_client: TapBankClient,
+            session_manager: DataBaseSessionManager,
+            logger: Optional[logging.Logger] = None,
+    ):
+        self.concurrency = config.ORDER_SUBMIT_CONCURRENCY
+        self.max_retries = config.ORDER_SUBMIT_MAX_RETRIES
+        self.backoff = config.ORDER_SUBMIT_BACKOFF
+        self.drain_timeout = config.ORDER_SUBMIT_DRAIN_TIMEOUT
+        self.stale_after = config.ORDER_SUBMIT_STALE_AFTER
+        self.recovery_interval = config.ORDER_SUBMIT_RECOVERY_INTERVAL
+        self.recovered = 0
+        self._pending_enqueued = False
+        self.tap_bank_client = tap_bank_client
+        self.session_manager = session_manager
+        self.logger = logger or logging.getLogger(__name__)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=config.ORDER_SUBMIT_QUEUE_SIZE)
+        self._workers: list[asyncio.Task] = []
+        self._recovery_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        try:
+            await self._enqueue_pending()
+        except Exception as error:
+            # Старт не блокируется: pending-заказы поставит в очередь цикл восстановления
+            self.logger.error(f'Failed to enqueue pending orders on start: {error}')
+        self._recovery_task = asyncio.create_task(self._run_recovery())
+
+    async def stop(self) -> None:
+        if self._recovery_task is not None:
+            self._recovery_task.cancel()
+            try:
+                await self._recovery_task
+            except asyncio.CancelledError:
+                pass
+            self._recovery_task = None
+        # Воркеры дорабатывают уже поставленные в очередь заказы, пока не получат None
+        # или не истечёт drain_timeout. Неотправленные заказы остаются pending в БД.
+        for _ in self._workers:
+            try:
+                self.queue.put_nowait(None)
+            except asyncio.QueueFull:
+                break
+        if self._workers:
+            _, pending = await asyncio.wait(self._workers, timeout=self.drain_timeout)
+            for task in pending:
+                task.cancel()
+        self._workers = []
+
+    def can_accept(self, count: int = 1) -> bool:
+        return self.queue.maxsize <= 0 or self.queue.maxsize - self.queue.qsize() >= count
+
+    def stats(self) -> dict:
+        return {
+            'queue_size': self.queue.qsize(),
+            'workers': len(self._workers),
+            'recovered': self.recovered,
+        }
+
+    def submit(self, order_id) -> bool:
+        """
+        Ставит заказ в очередь. Если очередь переполнена, заказ остаётся в статусе pending
+        и будет подхвачен при следующем запуске приложения.
+        """
+        try:
+            self.queue.put_nowait(order_id)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def _enqueue_pending(self) -> None:
+        async with self.session_manager.session() as session:
+            order_ids = await OrderService(OrderRepository(session)).get_pending_ids(self.queue.maxsize)
+        for order_id in order_ids:
+            self.submit(order_id)
+        self._pending_enqueued = True
+
+    async def recover_stale(self) -> None:
+        # Не больше, чем поместится в очередь: остальные заказы вернутся при следующем проходе
+        limit = self.queue.maxsize - self.queue.qsize() if self.queue.maxsize > 0 else self.concurrency * 100
+        if limit <= 0:
+            return
+        async with self.session_manager.session() as session:
+            order_ids = await OrderService(OrderRepository(session)).requeue_stale(self.stale_after, limit)
+        if order_ids:
+            self.logger.warning(f'Requeued {len(order_ids)} orders stuck in submitting')
+        self.recovered += len(order_ids)
+        for order_id in order_ids:
+            self.submit(order_id)
+
+    async def _run_recovery(self) -> None:
+        while True:
+            try:
+                if not self._pending_enqueued:
+                    await self._enqueue_pending()
+                await self.recover_stale()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                self.logger.error(f'Stale order recovery failed: {error}')
+            await asyncio.sleep(self.recovery_interval)
+
+    async def _worker(self) -> None:
+        while True:
+            order_id = await self.queue.get()
+            try:
+                if order_id is None:
+                    return
+                await self._process(order_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                self.logger.error(f'Order {order_id} submission crashed: {error}')
+            finally:
+                self.queue.task_done()
+
+    async def _process(self, order_id) -> None:
+        async with self.session_manager.session() as session:
+            order = await OrderService(OrderRepository(session)).claim_pending(order_id)
+        if order is None:
+            return
+
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                tap_bank_response = await self.tap_bank_client.create_sync_requisites(
+                    order.payload,
+                    raise_for_status=True
+                )
+                requisites = tap_bank_response.json()
+            except CustomHTTPException as error:
+                retryable = isinstance(error, TapBankError) and error.retryable
+                if retryable and attempt <= self.max_retries:
+                    await asyncio.sleep(self._backoff_delay(attempt))
+                    continue
+                await self._fail(order, str(error), attempt)
+                return
+            break
+
+        async with self.session_manager.session() as session:
+            await OrderService(OrderRepository(session)).mark_submitted(order.id, requisites, attempt)
+
+    async def _fail(self, order, error: str, attempts: int) -> None:
+        self.logger.error(f'Order {order.id} submission failed after {attempts} attempts: {error}')
+        async with self.session_manager.session() as session:
+            await OrderService(OrderRepository(session)).fail_order(
+                order,
+                error=error,
+                attempts=attempts,
+                user_service=UserService(UserRepository(session)),
+            )
+
+    def _backoff_delay(self, attempt: int) -> float:
+        delay = self.backoff * 2 ** (attempt - 1)
+        return delay + random.uniform(0, delay)
+
+
+class CallbackProcessor:
+    """
+    Пакетная обработка callback'ов TapBank.
+
+    Callback'и копятся до CALLBACK_BATCH_SIZE штук или CALLBACK_BATCH_DELAY секунд и применяются
+    в одной транзакции: события вставляются одним INSERT ... ON CONFLICT DO NOTHING в таблицу
+    идемпотентности, переходы статусов и возвраты баланса делаются только для новых событий.
+    Недавно обработанные события дополнительно помнятся в памяти, и повтор отсекается без обращения к БД.
+    """
+
+    def __init__(
+            self,
+            config: Config,
+            session_manager: DataBaseSessionManager,
+            logger: Optional[logging.Logger] = None,
+    ):
+        self.batch_size = config.CALLBACK_BATCH_SIZE
+        self.batch_delay = config.CALLBACK_BATCH_DELAY
+        self.dedup_ttl = config.CALLBACK_DEDUP_CACHE_TTL
+        self.drain_timeout = config.ORDER_SUBMIT_DRAIN_TIMEOUT
+        self.session_manager = session_manager
+        self.logger = logger or logging.getLogger(__name__)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=config.CALLBACK_QUEUE_SIZE)
+        self.processed = ExpiringLRUCache(maxsize=config.CALLBACK_DEDUP_CACHE_SIZE, clock=time.monotonic)
+        self.duplicates = 0
+        self.batches = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        await self.queue.put(None)
+        _, pending = await asyncio.wait([self._task], timeout=self.drain_timeout)
+        for task in pending:
+            task.cancel()
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            'queue_size': self.queue.qsize(),
+            'dedup_cache_size': len(self.processed),
+            'duplicates': self.duplicates,
+            'batches': self.batches,
+        }
+
+    async def process(self, callback: OrderCallback) -> str:
+        """
+        Return:
+        - str: 'applied', 'ignored', 'duplicate' или 'unknown_order'.
+        """
+        if self.processed.get(callback.idempotency_key) is not None:
+            self.duplicates += 1
+            return 'duplicate'
+
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((callback, future))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self.queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = loop.time() + self.batch_delay
+            while len(batch) < self.batch_size:
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._process_batch(batch)
+
+    async def _process_batch(self, batch: list) -> None:
+        self.batches += 1
+        unique: dict[str, OrderCallback] = {}
+        for callback, _ in batch:
+            unique.setdefault(callback.idempotency_key, callback)
+
+        results: dict[str, str] = {}
+        try:
+            async with self.session_manager.session() as session:
+                events = OrderCallbackEventRepository(session)
+                order_service = OrderService(OrderRepository(session))
+                new_keys = await events.insert_new([
+                    {'event_id': key, 'order_external_id': callback.id, 'status': callback.status}
+                    for key, callback in unique.items()
+                ])
+
+                refunds = []
+                unknown = []
+                for key, callback in unique.items():
+                    if key not in new_keys:
+                        results[key] = 'duplicate'
+                        continue
+                    result, applied = await order_service.apply_callback(callback.id, callback.status)
+                    results[key] = result
+                    if result == 'unknown_order':
+                        unknown.append(key)
+                    elif applied and applied[2]:
+                        order_id, user_id, amount = applied
+                        refunds.append((user_id, order_id, amount))
+
+                # Callback мог прийти раньше, чем сохранился external_id заказа: не запоминаем его,
+                # чтобы повторная доставка от TapBank была обработана.
+                await events.delete_many(unknown)
+                await UserService(UserRepository(session)).credit_balance(refunds)
+        except Exception as error:
+            self.logger.error(f'Order callbacks batch failed: {error}')
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        expires_at = time.monotonic() + self.dedup_ttl
+        for key, result in results.items():
+            if result != 'unknown_order':
+                self.processed.set(key, result, expires_at=expires_at)
+
+        answered = set()
+        for callback, future in batch:
+            key = callback.idempotency_key
+            result = results[key] if key not in answered else 'duplicate'
+            answered.add(key)
+            if result == 'duplicate':
+                self.duplicates += 1
+            if not future.done():
+                future.set_result(result)
+
+
+class IdempotencyKeyCleaner:
+    """
+    Фоновое удаление ключей идемпотентности старше IDEMPOTENCY_KEY_TTL.
+
+    Раз в IDEMPOTENCY_CLEANUP_INTERVAL секунд удаляет ключи пачками по IDEMPOTENCY_CLEANUP_BATCH_SIZE,
+    пока устаревшие ключи не закончатся. Ключи, захваченные другим процессом, пропускаются.
+    """
+
+    def __init__(
+            self,
+            config: Config,
+            session_manager: DataBaseSessionManager,
+            logger: Optional[logging.Logger] = None,
+    ):
+        self.ttl = config.IDEMPOTENCY_KEY_TTL
+        self.interval = config.IDEMPOTENCY_CLEANUP_INTERVAL
+        self.batch_size = config.IDEMPOTENCY_CLEANUP_BATCH_SIZE
+        self.session_manager = session_manager
+        self.logger = logger or logging.getLogger(__name__)
+        self.runs = 0
+        self.deleted = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            'runs': self.runs,
+            'deleted': self.deleted,
+        }
+
+    async def cleanup(self) -> None:
+        self.runs += 1
+        while True:
+            async with self.session_manager.session() as session:
+                deleted = await IdempotencyService(IdempotencyKeyRepository(session)).delete_expired(
+                    self.ttl, self.batch_size
+                )
+            self.deleted += deleted
+            if deleted < self.batch_size:
+                return
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.cleanup()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                self.logger.error(f'Idempotency key cleanup failed: {error}')
+            await asyncio.sleep(self.interval)
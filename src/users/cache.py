@@ -0,0 +1,58 @@
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from src.config import get_config
+from src.utils.cache import ExpiringLRUCache
+
+
+config = get_config()
+
+# Кэш пользователей для get_current_user: ключ - str(user.id), значение - отсоединённый от сессии экземпляр User.
+# Экземпляры общие для всех запросов, поэтому изменять их нельзя: пути записи читают пользователя заново.
+user_cache = ExpiringLRUCache(maxsize=config.USER_CACHE_SIZE, clock=time.monotonic)
+
+# Недавно изменённые пользователи: ключ - str(user.id), запись живёт USER_REPLICA_LAG секунд после изменения.
+# Реплика может ещё отдавать их старую строку, поэтому такие пользователи читаются с основной БД и не кэшируются.
+recently_invalidated_users = ExpiringLRUCache(maxsize=config.USER_CACHE_SIZE, clock=time.monotonic)
+
+_INVALIDATED_USERS_KEY = 'invalidated_user_ids'
+
+
+def recently_invalidated(user_id) -> bool:
+    return recently_invalidated_users.peek(str(user_id)) is not None
+
+
+def _mark_invalidated(user_id: str) -> None:
+    user_cache.pop(user_id)
+    recently_invalidated_users.set(user_id, True, expires_at=time.monotonic() + config.USER_REPLICA_LAG)
+
+
+def cache_user(user) -> None:
+    """
+    Кэширует пользователя, отсоединив его от сессии запроса, который его загрузил:
+    иначе rollback или закрытие этой сессии сбросили бы атрибуты общего экземпляра.
+    Недавно изменённый пользователь не кэшируется: чтение могло начаться до фиксации изменения.
+    """
+    if recently_invalidated(user.id):
+        return
+    session = object_session(user)
+    if session is not None:
+        session.expunge(user)
+    user_cache.set(str(user.id), user, expires_at=time.monotonic() + config.USER_CACHE_TTL)
+
+
+def invalidate_user(session, user_id) -> None:
+    """
+    Сбрасывает пользователя из кэша сразу и повторно после коммита сессии,
+    чтобы параллельный запрос не успел закэшировать данные до фиксации транзакции.
+    """
+    _mark_invalidated(str(user_id))
+    session.info.setdefault(_INVALIDATED_USERS_KEY, set()).add(str(user_id))
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session: Session) -> None:
+    for user_id in session.info.pop(_INVALIDATED_USERS_KEY, ()):
+        _mark_invalidated(user_id)
@@ -2,7 +2,7 @@ from typing import Annotated
 
 from fastapi import Depends
 
-from src.base.repository import get_repository
+from src.base.repository import get_read_repository, get_repository
 from src.users.service import UserService
 
 from src.users.repositories import UserRepository
@@ -12,3 +12,10 @@ def get_user_service(
         repository: Annotated[UserRepository, Depends(get_repository(UserRepository))]
 ):
     return UserService(repository)
+
+
+
+def get_read_user_service(
+        repository: Annotated[UserRepository, Depends(get_read_repository(UserRepository))]
+):
+    return UserService(repository)
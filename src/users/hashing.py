@@ -0,0 +1,109 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable
+
+from passlib.context import CryptContext
+
+from src.config import get_config
+from src.utils.exceptions import CustomHTTPException
+
+
+pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+
+
+def _timed_call(func: Callable, args: tuple, enqueued_at: float) -> tuple[float, object]:
+    # Выполняется в воркере пула: время ожидания считаем от постановки в очередь до старта.
+    wait_time = time.monotonic() - enqueued_at
+    return wait_time, func(*args)
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Выполняет bcrypt-хэширование и проверку паролей в пуле воркеров, не блокируя event loop.
+
+    Parameters:
+    - workers (int): Количество потоков/процессов пула.
+    - max_queue (int): Сколько операций может ждать свободного воркера.
+      При переполнении очереди запрос сразу отклоняется с кодом 503.
+    - executor_type (str): 'thread' или 'process'.
+    """
+
+    def __init__(self, workers: int, max_queue: int, executor_type: str = 'thread'):
+        self.workers = workers
+        self.max_pending = workers + max_queue
+        self.executor_type = executor_type
+        self._executor = self._create_executor()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(_verify, password, hashed_password)
+
+    def stats(self) -> dict:
+        return {
+            'pending': self.pending,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'wait_time_total': self.wait_time_total,
+            'wait_time_max': self.wait_time_max,
+        }
+
+    async def warm_up(self) -> None:
+        """Запускает воркеры пула и загружает backend bcrypt до первых запросов."""
+        await asyncio.gather(*(self._run(_hash, 'warm-up') for _ in range(self.workers)))
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _create_executor(self) -> Executor:
+        if self.executor_type == 'process':
+            return ProcessPoolExecutor(max_workers=self.workers)
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hasher')
+
+    async def _run(self, func: Callable, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise CustomHTTPException(
+                message='Too many authorization requests, try again later',
+                status_code=503,
+            )
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            wait_time, result = await loop.run_in_executor(
+                self._executor, _timed_call, func, args, time.monotonic()
+            )
+        finally:
+            self.pending -= 1
+
+        self.completed += 1
+        self.wait_time_total += wait_time
+        self.wait_time_max = max(self.wait_time_max, wait_time)
+        return result
+
+
+@lru_cache
+def get_password_hasher() -> PasswordHasher:
+    config = get_config()
+    return PasswordHasher(
+        workers=config.PASSWORD_HASH_WORKERS,
+        max_queue=config.PASSWORD_HASH_MAX_QUEUE,
+        executor_type=config.PASSWORD_HASH_EXECUTOR,
+    )
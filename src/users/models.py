@@ -1,10 +1,13 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
 from uuid import uuid4, UUID
 
-from sqlalchemy import CheckConstraint
+from sqlalchemy import BigInteger, CheckConstraint, ForeignKey, Identity, Index, func, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship, backref
 
 from src.database.base_models import Base
-from src.database.field_typing import str_255
+from src.database.field_typing import money_minor, str_32, str_255
 from src.tap_bank.models import Order
 
 
@@ -21,10 +24,44 @@ class User(Base):
     phone: Mapped[str_255]
     email: Mapped[str_255]
 
-    balance: Mapped[float] = mapped_column(default=0.0, server_default='0.0')
+    # Материализованный баланс в копейках: сумма всех применённых записей BalanceLedgerEntry.
+    # Доступный баланс = balance + сумма ещё не применённых записей (см. UserRepository.get_balance).
+    balance: Mapped[money_minor] = mapped_column(default=0, server_default='0')
 
     orders: Mapped[Order] = relationship(uselist=True, backref=backref('user', uselist=True, cascade='all'))
 
     __table_args__ = (
-        CheckConstraint('balance >= 0.0', name='check_balance_minimum'),
+        CheckConstraint('balance >= 0', name='check_balance_minimum'),
+    )
+
+
+class BalanceOperation(str, Enum):
+    OPENING = 'opening'  # баланс на момент перехода на журнал
+    DEPOSIT = 'deposit'
+    ORDER_DEBIT = 'order_debit'  # резерв суммы заказа при создании
+    ORDER_REFUND = 'order_refund'  # возврат резерва неотправленного или отменённого заказа
+    ADJUSTMENT = 'adjustment'
+
+
+class BalanceLedgerEntry(Base):
+    """
+    Журнал движений баланса, только добавление записей.
+
+    Списания применяются к User.balance сразу в том же UPDATE, который проверяет достаточность средств.
+    Зачисления только добавляются в журнал (applied=False) и не блокируют строку пользователя,
+    в User.balance их переносит BalanceCompactor. Кроме флага applied записи не изменяются.
+    """
+    __tablename__ = 'balance_ledger_entry'
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    user_id: Mapped[UUID] = mapped_column(ForeignKey('user.id'))
+    amount: Mapped[money_minor]  # со знаком: списания отрицательные
+    operation: Mapped[str_32]
+    order_id: Mapped[Optional[UUID]]
+    applied: Mapped[bool] = mapped_column(default=False, server_default='false')
+    created_at: Mapped[datetime] = mapped_column(server_default=func.now())
+
+    __table_args__ = (
+        Index('ix_balance_ledger_entry_user_id_id', 'user_id', 'id'),
+        Index('ix_balance_ledger_entry_not_applied', 'user_id', postgresql_where=text('NOT applied')),
     )
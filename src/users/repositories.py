@@ -1,8 +1,9 @@
 from typing import Optional
 
-from sqlalchemy import select
+from sqlalchemy import func, insert, select, update
 
 from src.users import models
+from src.users.cache import invalidate_user
 from src.base.repository import BaseRepository
 
 
@@ -14,6 +15,7 @@ class UserRepository(BaseRepository[models.User]):
         user = await self.session.scalar(query)
         if user:
             user.is_superuser = status
+            invalidate_user(self.session, user.id)
             return user
 
     async def set_superuser_status_by_id(self, id, status: bool) -> Optional[models.User]:
@@ -21,6 +23,7 @@ class UserRepository(BaseRepository[models.User]):
         user = await self.session.scalar(query)
         if user:
             user.is_superuser = status
+            invalidate_user(self.session, user.id)
             return user
 
     async def get_one(self, pk, *args, **kwargs):
@@ -36,4 +39,95 @@ class UserRepository(BaseRepository[models.User]):
     async def update(self, user: models.User, data: dict):
         for key, value in data.items():
             setattr(user, key, value)
+        invalidate_user(self.session, user.id)
         return user
+
+    async def debit_balance(self, user_id, entries: list[dict]) -> Optional[int]:
+        """
+        Списывает сумму записей entries одним UPDATE ... WHERE balance >= total RETURNING balance
+        и добавляет записи в журнал уже применёнными.
+
+        Parameters:
+        - entries (list[dict]): Записи журнала с положительным amount в копейках, operation и order_id.
+
+        Return:
+        - Optional[int]: новый материализованный баланс или None, если средств недостаточно.
+        """
+        total = sum(entry['amount'] for entry in entries)
+        query = (
+            update(self.model)
+            .where(self.model.id == user_id, self.model.balance >= total)
+            .values(balance=self.model.balance - total)
+            .returning(self.model.balance)
+        )
+        new_balance = await self.session.scalar(query)
+        if new_balance is None:
+            return None
+
+        await self.session.execute(insert(models.BalanceLedgerEntry), [
+            {**entry, 'user_id': user_id, 'amount': -entry['amount'], 'applied': True}
+            for entry in entries
+        ])
+        invalidate_user(self.session, user_id)
+        return new_balance
+
+    async def credit_balance(self, entries: list[dict]) -> None:
+        """
+        Добавляет зачисления в журнал одним INSERT, не блокируя строки пользователей.
+        В User.balance их переносит compact_balances.
+
+        Parameters:
+        - entries (list[dict]): Записи журнала с user_id, положительным amount в копейках, operation и order_id.
+        """
+        if entries:
+            await self.session.execute(insert(models.BalanceLedgerEntry), entries)
+
+    async def get_balance(self, user_id) -> Optional[int]:
+        """Доступный баланс в копейках: материализованный баланс плюс ещё не применённые записи журнала."""
+        ledger = models.BalanceLedgerEntry
+        pending = (
+            select(func.coalesce(func.sum(ledger.amount), 0))
+            .where(ledger.user_id == user_id, ledger.applied.is_(False))
+            .scalar_subquery()
+        )
+        query = select(self.model.balance + pending).where(self.model.id == user_id)
+        return await self.session.scalar(query)
+
+    async def compact_balances(self, limit: int, user_id=None) -> int:
+        """
+        Переносит до limit неприменённых записей журнала в User.balance одним запросом:
+        записи помечаются applied, суммы по пользователям добавляются к балансу.
+        Записи, заблокированные параллельной компактизацией, пропускаются (SKIP LOCKED).
+
+        Return:
+        - int: количество пользователей, чей баланс обновлён.
+        """
+        ledger = models.BalanceLedgerEntry
+        locked = select(ledger.id).where(ledger.applied.is_(False)).order_by(ledger.id).limit(limit)
+        if user_id is not None:
+            locked = locked.where(ledger.user_id == user_id)
+        locked = locked.with_for_update(skip_locked=True)
+
+        applied = (
+            update(ledger)
+            .where(ledger.id.in_(locked))
+            .values(applied=True)
+            .returning(ledger.user_id, ledger.amount)
+            .cte('applied')
+        )
+        totals = (
+            select(applied.c.user_id, func.sum(applied.c.amount).label('amount'))
+            .group_by(applied.c.user_id)
+            .cte('totals')
+        )
+        query = (
+            update(self.model)
+            .where(self.model.id == totals.c.user_id)
+            .values(balance=self.model.balance + totals.c.amount)
+            .returning(self.model.id)
+            .execution_options(synchronize_session=False)
+        )
+        user_ids = (await self.session.scalars(query)).all()
+        for compacted_user_id in user_ids:
+            invalidate_user(self.session, compacted_user_id)
+        return len(user_ids)
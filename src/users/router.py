@@ -4,19 +4,28 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 
 from src.users.dependencies import get_user_service
+from src.users.models import User
 from src.users.schemas import (
     Token as TokenSchema,
     User as UserSchema,
+    UserBalance as UserBalanceSchema,
     UserRegister as UserRegisterSchema
 )
 from src.users.service import TokenService, UserService
+from src.users.utils import CurrentUserChecker
 
 from src.utils.exceptions import CustomHTTPException
+from src.utils.money import from_minor
+from src.utils.rate_limit import RateLimit, global_key
 
 users_router = APIRouter()
 
+# Хэширование паролей дорогое, поэтому ограничиваются и запросы с одного IP, и общий поток
+auth_rate_limits = [Depends(RateLimit('auth')), Depends(RateLimit('auth_global', key=global_key))]
 
-@users_router.post("/auth/registration", tags=['Authorization'], status_code=status.HTTP_200_OK, response_model=UserSchema)
+
+@users_router.post("/auth/registration", tags=['Authorization'], status_code=status.HTTP_200_OK, response_model=UserSchema,
+                  dependencies=auth_rate_limits)
 async def registration(
         new_user: Annotated[UserRegisterSchema, Depends()],
         user_service: Annotated[UserService, Depends(get_user_service)],
@@ -31,7 +40,8 @@ async def registration(
     return new_user
 
 
-@users_router.post("/auth/authorization", tags=["Authorization"], status_code=status.HTTP_200_OK, response_model=TokenSchema)
+@users_router.post("/auth/authorization", tags=["Authorization"], status_code=status.HTTP_200_OK, response_model=TokenSchema,
+                  dependencies=auth_rate_limits)
 async def authorization(
         credentials: Annotated[OAuth2PasswordRequestForm, Depends()],
         user_service: Annotated[UserService, Depends(get_user_service)],
@@ -45,3 +55,12 @@ async def authorization(
             detail=str(error)
         )
     return tokens
+
+
+@users_router.get("/users/me/balance", tags=['Users'], status_code=status.HTTP_200_OK, response_model=UserBalanceSchema)
+async def balance(
+        current_user: Annotated[User, Depends(CurrentUserChecker())],
+        user_service: Annotated[UserService, Depends(get_user_service)],
+):
+    """Доступный баланс: читается с основной БД, так как кэш пользователя и реплика могут отставать."""
+    return {'balance': from_minor(await user_service.get_balance(current_user.id))}
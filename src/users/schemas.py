@@ -24,3 +24,7 @@ class User(UserBase):
 
 class UserRegister(UserBase):
     password: str
+
+
+class UserBalance(BaseScheme):
+    balance: float  # в рублях, с учётом ещё не применённых записей журнала баланса
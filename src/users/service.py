@@ -1,4 +1,7 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Optional
 from uuid import UUID
 
 import jwt
@@ -8,14 +11,12 @@ from fastapi.security import OAuth2PasswordRequestForm
 from src.base.service import BaseService
 from src.config import Config, get_config
 from src.users import models
+from src.users.cache import cache_user, user_cache
+from src.users.hashing import get_password_hasher
 from src.users.repositories import UserRepository
 from src.users.schemas import UserRegister
 from src.utils.exceptions import CustomHTTPException
 
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
-
 
 class UserService(BaseService[UserRepository, models.User]):
 
@@ -29,13 +30,13 @@ class UserService(BaseService[UserRepository, models.User]):
 
         new_user = await self.create({
             **new_user.model_dump(exclude={'password'}),
-            'hashed_password': pwd_context.hash(new_user.password)
+            'hashed_password': await get_password_hasher().hash(new_user.password)
         })
         return new_user
 
     async def authorization(self, credentials: OAuth2PasswordRequestForm, token_service):
         user = await self.repository.get_one_by_username(credentials.username)
-        if not (user and pwd_context.verify(credentials.password, user.hashed_password)):
+        if not (user and await get_password_hasher().verify(credentials.password, user.hashed_password)):
             raise CustomHTTPException(
                 message='Incorrect username or password',
                 status_code=401,
@@ -49,6 +50,14 @@ class UserService(BaseService[UserRepository, models.User]):
             'refresh_token': refresh_token,
         }
 
+    async def get_one_cached(self, user_id) -> Optional[models.User]:
+        user = user_cache.get(str(user_id))
+        if user is None:
+            user = await self.repository.get_one(user_id)
+            if user is not None:
+                cache_user(user)
+        return user
+
     async def set_superuser_status_by_username(self, username, status: bool):
         return await self.repository.set_superuser_status_by_username(username, status)
 
@@ -63,10 +72,88 @@ class UserService(BaseService[UserRepository, models.User]):
     async def update(self, *args, **kwargs):
         return await self.repository.update(*args, **kwargs)
 
+    async def debit_balance(
+            self,
+            user_id,
+            amounts: dict[Optional[UUID], int],
+            operation: models.BalanceOperation = models.BalanceOperation.ORDER_DEBIT,
+    ) -> Optional[int]:
+        """
+        Резервирует сумму на балансе: списывает её одним UPDATE и пишет по записи журнала на каждый заказ.
+        Если материализованного баланса не хватает, сначала переносит в него ещё не применённые зачисления.
+
+        Parameters:
+        - amounts (dict): {id заказа или None: сумма в копейках}.
+
+        Return:
+        - Optional[int]: новый баланс в копейках или None, если средств недостаточно.
+        """
+        entries = [
+            {'amount': amount, 'operation': operation.value, 'order_id': order_id}
+            for order_id, amount in amounts.items()
+        ]
+        new_balance = await self.repository.debit_balance(user_id, entries)
+        if new_balance is None and await self.repository.compact_balances(get_config().BALANCE_COMPACT_BATCH_SIZE, user_id):
+            new_balance = await self.repository.debit_balance(user_id, entries)
+        return new_balance
+
+    async def credit_balance(
+            self,
+            amounts: list[tuple[Any, Optional[UUID], int]],
+            operation: models.BalanceOperation = models.BalanceOperation.ORDER_REFUND,
+    ) -> None:
+        """
+        Зачисляет суммы, только добавляя записи в журнал.
+
+        Parameters:
+        - amounts (list): [(id пользователя, id заказа или None, сумма в копейках)].
+        """
+        await self.repository.credit_balance([
+            {'user_id': user_id, 'order_id': order_id, 'amount': amount, 'operation': operation.value}
+            for user_id, order_id, amount in amounts
+            if amount
+        ])
+
+    async def get_balance(self, user_id) -> Optional[int]:
+        return await self.repository.get_balance(user_id)
+
+
+@dataclass(frozen=True)
+class JWTKeys:
+    algorithm: str
+    private_key: Any
+    public_key: Any
+
+
+@lru_cache
+def get_jwt_keys() -> JWTKeys:
+    """
+    Один раз разбирает PEM-ключи из конфига в объекты cryptography.
+
+    PyJWT принимает готовые объекты ключей как есть, поэтому при encode/decode
+    ключ больше не парсится на каждый вызов. Поддерживаются любые асимметричные
+    алгоритмы PyJWT (RS256, ES256, EdDSA и т.д.), выбор через JWT_ALGORITHM.
+    """
+    config = get_config()
+    algorithm = jwt.algorithms.get_default_algorithms()[config.JWT_ALGORITHM]
+    return JWTKeys(
+        algorithm=config.JWT_ALGORITHM,
+        private_key=algorithm.prepare_key(config.JWT_PRIVATE_KEY.get_secret_value()),
+        public_key=algorithm.prepare_key(config.JWT_PUBLIC_KEY.get_secret_value()),
+    )
+
+
+def warm_up_jwt() -> None:
+    """Разбирает ключи и выполняет пробные подпись и проверку токена, прогревая backend cryptography."""
+    keys = get_jwt_keys()
+    token = jwt.encode({'warm_up': True}, keys.private_key, algorithm=keys.algorithm)
+    jwt.decode(token, keys.public_key, algorithms=[keys.algorithm])
+
 
 class TokenService:
     def __init__(self, config: Config = Depends(get_config)):
         self.config = config
+        self.keys = get_jwt_keys()
 
     async def create_access_token(self, data: dict) -> str:
         return await self._create_token(
@@ -90,16 +177,16 @@ class TokenService:
         to_encode.update({"exp": expire})
         encoded_jwt = jwt.encode(
             payload=to_encode,
-            key=self.config.JWT_PRIVATE_KEY.get_secret_value(),
-            algorithm=self.config.JWT_ALGORITHM,
+            key=self.keys.private_key,
+            algorithm=self.keys.algorithm,
         )
         return encoded_jwt
 
     async def decode_token(self, token: str) -> dict:
         payload = jwt.decode(
             jwt=token,
-            key=self.config.JWT_PUBLIC_KEY.get_secret_value(),
-            algorithms=[self.config.JWT_ALGORITHM]
+            key=self.keys.public_key,
+            algorithms=[self.keys.algorithm]
         )
         return payload
 
@@ -1,27 +1,63 @@
+import hashlib
 from dataclasses import dataclass
 from typing import Annotated, Optional
 from enum import Enum
 
 import jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
+from src.config import get_config
 from src.users.models import User
 from src.users.service import UserService, TokenService
-from src.users.dependencies import get_user_service
+from src.users.cache import recently_invalidated
+from src.users.dependencies import get_read_user_service, get_user_service
+from src.utils.cache import ExpiringLRUCache
+from src.utils.rate_limit import client_ip
 
 
 security = HTTPBearer()
+config = get_config()
 
+# Кэш уже проверенных токенов: ключ - sha256 токена, значение - payload, живёт до exp токена.
+verified_token_cache = ExpiringLRUCache(maxsize=config.VERIFIED_TOKEN_CACHE_SIZE)
 
-async def get_current_user(
+
+def _token_key(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+def user_or_ip_key(request: Request) -> str:
+    """
+    Ключ корзины rate limit: id пользователя, если его токен уже проверен и лежит в кэше, иначе IP клиента.
+    Подпись токена здесь не проверяется, поэтому непроверенный токен не может занять чужую корзину.
+    """
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() == 'bearer' and token:
+        payload = verified_token_cache.peek(_token_key(token))
+        if payload is not None and payload.get('id') is not None:
+            return f'user:{payload["id"]}'
+    return client_ip(request)
+
+
+async def decode_verified_token(token_service: TokenService, token: str) -> dict:
+    key = _token_key(token)
+    payload = verified_token_cache.get(key)
+    if payload is None:
+        payload = await token_service.decode_token(token)
+        expire = payload.get('exp')
+        if expire is not None:
+            verified_token_cache.set(key, payload, expires_at=expire)
+    return payload
+
+
+async def get_current_user_id(
     token_service: Annotated[TokenService, Depends()],
     credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
-    user_service: Annotated[UserService, Depends(get_user_service)],
-):
+) -> str:
     token = credentials.credentials
     try:
-        payload = await token_service.decode_token(token)
+        payload = await decode_verified_token(token_service, token)
         user_id = payload.get("id")
         if user_id is None:
             raise HTTPException(
@@ -38,7 +74,26 @@ async def get_current_user(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail='Token is expired'
         )
-    user = await user_service.get_one(user_id)
+    return user_id
+
+
+async def get_current_user(
+    user_id: Annotated[str, Depends(get_current_user_id)],
+    read_user_service: Annotated[UserService, Depends(get_read_user_service)],
+    user_service: Annotated[UserService, Depends(get_user_service)],
+):
+    if recently_invalidated(user_id):
+        # Реплика может ещё отдавать строку до изменения
+        return _check_user_exists(await user_service.get_one_cached(user_id), user_id)
+
+    user = await read_user_service.get_one_cached(user_id)
+    if user is None:
+        # Реплика может отставать и ещё не видеть только что зарегистрированного пользователя
+        user = await user_service.get_one_cached(user_id)
+    return _check_user_exists(user, user_id)
+
+
+def _check_user_exists(user: Optional[User], user_id: str) -> User:
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -65,3 +120,4 @@ class CurrentUserChecker:
                 if permission.name in self.allowed_permissions:
                     return True
         return False
+
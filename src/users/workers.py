@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from typing import Optional
+
+from src.config import Config
+from src.database.session import DataBaseSessionManager
+from src.users.repositories import UserRepository
+
+
+class BalanceCompactor:
+    """
+    Фоновый перенос зачислений из журнала баланса в User.balance.
+
+    Раз в BALANCE_COMPACT_INTERVAL секунд применяет до BALANCE_COMPACT_BATCH_SIZE записей одним запросом,
+    пока неприменённые записи не закончатся. Несколько процессов могут работать параллельно:
+    записи, уже захваченные другим процессом, пропускаются.
+    """
+
+    def __init__(
+            self,
+            config: Config,
+            session_manager: DataBaseSessionManager,
+            logger: Optional[logging.Logger] = None,
+    ):
+        self.interval = config.BALANCE_COMPACT_INTERVAL
+        self.batch_size = config.BALANCE_COMPACT_BATCH_SIZE
+        self.session_manager = session_manager
+        self.logger = logger or logging.getLogger(__name__)
+        self.runs = 0
+        self.compacted_users = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Переносим то, что накопилось с последнего запуска
+        try:
+            await self.compact()
+        except Exception as error:
+            self.logger.error(f'Balance compaction on shutdown failed: {error}')
+
+    def stats(self) -> dict:
+        return {
+            'runs': self.runs,
+            'compacted_users': self.compacted_users,
+        }
+
+    async def compact(self) -> None:
+        self.runs += 1
+        while True:
+            async with self.session_manager.session() as session:
+                compacted = await UserRepository(session).compact_balances(self.batch_size)
+            self.compacted_users += compacted
+            if compacted == 0:
+                return
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.compact()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                self.logger.error(f'Balance compaction failed: {error}')
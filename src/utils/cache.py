@@ -0,0 +1,160 @@
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    fresh_until: float
+    stale_until: float
+
+
+class TTLCache:
+    """
+    Асинхронный in-process кэш с TTL, stale-while-revalidate и объединением запросов.
+
+    Parameters:
+    - ttl (float): Сколько секунд значение считается свежим.
+    - stale_ttl (float): Сколько секунд после ttl можно отдавать устаревшее значение,
+      параллельно обновляя его в фоне.
+
+    Одновременные промахи по одному ключу приводят ровно к одному вызову loader,
+    остальные вызовы ждут его результат. Ошибки loader не кэшируются.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float = 0.0):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: dict[Hashable, CacheEntry] = {}
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        now = time.monotonic()
+        entry = self._entries.get(key)
+
+        if entry is not None and now < entry.fresh_until:
+            self.hits += 1
+            return entry.value
+
+        if entry is not None and now < entry.stale_until:
+            self.stale_hits += 1
+            self._load(key, loader)
+            return entry.value
+
+        self.misses += 1
+        return await asyncio.shield(self._load(key, loader))
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+        }
+
+    def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._refresh(key, loader))
+            task.add_done_callback(self._consume_exception)
+            self._in_flight[key] = task
+        return task
+
+    async def _refresh(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await loader()
+            now = time.monotonic()
+            self._entries[key] = CacheEntry(
+                value=value,
+                fresh_until=now + self.ttl,
+                stale_until=now + self.ttl + self.stale_ttl,
+            )
+            return value
+        finally:
+            self._in_flight.pop(key, None)
+
+    @staticmethod
+    def _consume_exception(task: asyncio.Task) -> None:
+        # Фоновое обновление может упасть, когда его никто не ждёт: забираем исключение,
+        # чтобы asyncio не писал "Task exception was never retrieved".
+        if not task.cancelled():
+            task.exception()
+
+
+class ExpiringLRUCache:
+    """
+    Ограниченный по размеру LRU-кэш, в котором у каждой записи свой срок жизни.
+
+    Parameters:
+    - maxsize (int): Максимальное количество записей, при переполнении вытесняется самая старая по использованию.
+    - clock (Callable): Источник времени для expires_at, по умолчанию time.time (unix timestamp).
+    """
+
+    def __init__(self, maxsize: int, clock: Callable[[], float] = time.time):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._entries: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._entries.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+
+        value, expires_at = item
+        if self.clock() >= expires_at:
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Значение без учёта в статистике и без изменения порядка вытеснения."""
+        item = self._entries.get(key)
+        if item is None or self.clock() >= item[1]:
+            return None
+        return item[0]
+
+    def set(self, key: Hashable, value: Any, expires_at: float) -> None:
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
@@ -1,18 +1,61 @@
+import atexit
+import json
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует запись в одну JSON-строку."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': self.formatTime(record),
+            'name': record.name,
+            'level': record.levelname,
+            'file': f'{record.filename}:{record.lineno}',
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class InProcessQueueHandler(QueueHandler):
+    """
+    QueueHandler для очереди внутри процесса.
+
+    Стандартный prepare() форматирует сообщение и traceback в вызывающем потоке,
+    здесь запись передаётся как есть, и всё форматирование выполняется в потоке QueueListener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
 
 
 def get_logger(
     log_level: str,
     name: str,
     logs_path: str,
+    max_bytes: int = 0,
+    backup_count: int = 0,
+    rotation_when: str = '',
+    json_format: bool = False,
 ) -> logging.Logger:
     """
     Настроивает и получает экземпляр логгера.
 
+    Логгер только кладёт записи в очередь, запись в файл выполняет фоновый поток,
+    поэтому вызовы логгера не блокируют event loop дисковым I/O.
+
     Parameters:
     - log_level str: Уровень логирования.
     - name (str): Имя логгера.
     - logs_path (str): Директория с логами
+    - max_bytes (int): Ротация по размеру файла, 0 - без ротации по размеру.
+    - backup_count (int): Сколько старых файлов хранить при ротации.
+    - rotation_when (str): Ротация по времени ('midnight', 'H', 'D' и т.д.), имеет приоритет над max_bytes.
+    - json_format (bool): Писать записи в формате JSON lines.
 
     Return:
     - logging.Logger: экземляр класса Logger
@@ -29,16 +72,41 @@ def get_logger(
     logger = logging.getLogger(name)
     logger.setLevel(log_lvl_map.get(log_level.lower(), logging.ERROR))
 
-    main_handler = logging.FileHandler(
-        f'{logs_path}/{name}.log',
-        encoding='utf-8'
-    )
+    filename = f'{logs_path}/{name}.log'
+    if rotation_when:
+        main_handler = TimedRotatingFileHandler(
+            filename,
+            when=rotation_when,
+            backupCount=backup_count,
+            encoding='utf-8'
+        )
+    elif max_bytes:
+        main_handler = RotatingFileHandler(
+            filename,
+            maxBytes=max_bytes,
+            backupCount=backup_count,
+            encoding='utf-8'
+        )
+    else:
+        main_handler = logging.FileHandler(
+            filename,
+            encoding='utf-8'
+        )
 
-    formatter = logging.Formatter(
-        '[%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d] %(message)s'
-    )
+    if json_format:
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            '[%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d] %(message)s'
+        )
     main_handler.setFormatter(formatter)
 
-    logger.addHandler(main_handler)
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, main_handler, respect_handler_level=True)
+    listener.start()
+    # Дописываем оставшиеся в очереди записи при завершении процесса
+    atexit.register(listener.stop)
+
+    logger.addHandler(InProcessQueueHandler(log_queue))
 
     return logger
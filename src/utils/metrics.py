@@ -0,0 +1,162 @@
+import time
+from bisect import bisect_left
+from typing import Iterable, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами бакетов, как histogram в Prometheus."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> Iterable[tuple[str, int]]:
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield _format_value(bound), total
+        yield '+Inf', self.count
+
+
+class HttpMetrics:
+    """
+    Метрики HTTP-запросов: гистограммы длительности по (method, route, status) и число запросов в обработке.
+
+    route - шаблон пути (/orders/{order_id}), а не сам путь, чтобы число серий не росло с числом id.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.durations: dict[tuple[str, str, str], Histogram] = {}
+        self.in_flight = 0
+
+    def observe(self, method: str, route: str, status: int, duration: float) -> None:
+        key = (method, route, str(status))
+        histogram = self.durations.get(key)
+        if histogram is None:
+            histogram = self.durations[key] = Histogram(self.buckets)
+        histogram.observe(duration)
+
+    def render(self) -> list[str]:
+        lines = render_histograms(
+            'http_request_duration_seconds',
+            'HTTP request duration in seconds.',
+            [
+                ({'method': method, 'route': route, 'status': status}, histogram)
+                for (method, route, status), histogram in sorted(self.durations.items())
+            ]
+        )
+        lines += [
+            '# HELP http_requests_in_flight HTTP requests currently being processed.',
+            '# TYPE http_requests_in_flight gauge',
+            f'http_requests_in_flight {self.in_flight}',
+        ]
+        return lines
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware, замеряющее длительность запросов по монотонным часам.
+
+    В отличие от @app.middleware('http') не оборачивает запрос и ответ в Request/Response
+    и не буферизует тело, поэтому не ломает стриминг. Заголовок X-Process-Time содержит
+    время до начала отправки ответа, в гистограмму попадает время до отправки последнего байта.
+    """
+
+    def __init__(self, app: ASGIApp, metrics: HttpMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+        root_path = scope.get('root_path', '')
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                headers = list(message.get('headers', []))
+                headers.append((b'x-process-time', str(time.perf_counter() - start).encode()))
+                message = {**message, 'headers': headers}
+            await send(message)
+
+        self.metrics.in_flight += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.metrics.in_flight -= 1
+            self.metrics.observe(scope['method'], _route_template(scope, root_path), status, time.perf_counter() - start)
+
+
+def render_histograms(name: str, description: str, series: list[tuple[dict, Histogram]]) -> list[str]:
+    """Гистограммы с одним именем метрики, различающиеся метками."""
+    lines = [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+    for labels, histogram in series:
+        for bound, count in histogram.cumulative():
+            lines.append(f'{name}_bucket{_format_labels({**labels, "le": bound})} {count}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}')
+        lines.append(f'{name}_count{_format_labels(labels)} {histogram.count}')
+    return lines
+
+
+def render_stats(name: str, stats: dict, labels: Optional[dict] = None) -> list[str]:
+    """Переводит словарь из stats() компонента в gauge-метрики вида <name>_<ключ>."""
+    return render_labeled_stats(name, [(labels or {}, stats)])
+
+
+def render_labeled_stats(name: str, series: list[tuple[dict, dict]]) -> list[str]:
+    """То же, что render_stats, для нескольких однотипных компонентов, различающихся метками."""
+    metrics: dict[str, list[str]] = {}
+    for labels, stats in series:
+        for key, value in stats.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            metric = f'{name}_{key}'
+            metrics.setdefault(metric, []).append(f'{metric}{_format_labels(labels)} {_format_value(value)}')
+
+    lines = []
+    for metric, values in metrics.items():
+        lines.append(f'# TYPE {metric} gauge')
+        lines += values
+    return lines
+
+
+def _route_template(scope: Scope, root_path: str) -> str:
+    # Роутер кладёт найденный маршрут в scope. Mount (статика) маршрут не кладёт,
+    # но дописывает свой префикс в root_path, его и используем.
+    path = getattr(scope.get('route'), 'path', None)
+    if path is not None:
+        return path
+    mount_path = scope.get('root_path', '')[len(root_path):]
+    return mount_path or 'unmatched'
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in labels.items()) + '}'
+
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
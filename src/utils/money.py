@@ -0,0 +1,15 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Union
+
+
+# Количество минорных единиц (копеек) в основной единице валюты
+MINOR_UNITS = 100
+
+
+def to_minor(amount: Union[float, Decimal, str]) -> int:
+    """Переводит сумму в основных единицах (рублях) в целое число минорных единиц без ошибок округления float."""
+    return int((Decimal(str(amount)) * MINOR_UNITS).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_minor(amount: int) -> Decimal:
+    return Decimal(amount) / MINOR_UNITS
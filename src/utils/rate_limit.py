@@ -0,0 +1,211 @@
+"""
+Ограничение частоты запросов по алгоритму token bucket.
+
+Политики задаются в Config.RATE_LIMITS: {имя: (токенов в секунду, ёмкость корзины)}.
+Корзины хранятся в памяти процесса или, при RATE_LIMIT_BACKEND=redis (нужен пакет redis),
+в общем Redis, чтобы лимит действовал на все воркеры сразу.
+"""
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from fastapi import HTTPException, Request, status
+
+from src.config import Config
+
+try:
+    from redis import asyncio as redis
+except ImportError:
+    redis = None
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    rate: float  # токенов в секунду
+    burst: int  # ёмкость корзины, столько запросов можно сделать подряд
+
+
+class MemoryRateLimitBackend:
+    """Корзины в памяти процесса. При переполнении вытесняется давно не использованная корзина."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def acquire(self, key: str, policy: RateLimitPolicy, cost: int = 1) -> float:
+        """
+        Return:
+        - float: 0, если токены списаны, иначе через сколько секунд их станет достаточно.
+        """
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (policy.burst, now))
+        tokens = min(policy.burst, tokens + (now - updated) * policy.rate)
+        # Запрос дороже ёмкости корзины ждёт полной корзины и уводит её в минус,
+        # следующие запросы ждут, пока долг не восполнится
+        required = min(cost, policy.burst)
+        wait = 0.0
+        if tokens >= required:
+            tokens -= cost
+        else:
+            wait = (required - tokens) / policy.rate
+
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    async def close(self) -> None:
+        self._buckets.clear()
+
+
+# Тот же алгоритм, что в MemoryRateLimitBackend, атомарно на стороне Redis.
+# Время берётся из Redis, чтобы не зависеть от расхождения часов воркеров.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or burst
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local required = math.min(cost, burst)
+local wait = 0
+if tokens >= required then
+    tokens = tokens - cost
+else
+    wait = (required - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000))
+return tostring(wait)
+"""
+
+
+class RedisRateLimitBackend:
+    """Корзины в Redis, общие для всех воркеров и инстансов API."""
+
+    def __init__(self, url: str, prefix: str = 'rate_limit:'):
+        if redis is None:
+            raise RuntimeError('redis is not installed, it is required for RATE_LIMIT_BACKEND=redis')
+        self.prefix = prefix
+        self.client = redis.from_url(url)
+        self.script = self.client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def acquire(self, key: str, policy: RateLimitPolicy, cost: int = 1) -> float:
+        wait = await self.script(keys=[self.prefix + key], args=[policy.rate, policy.burst, cost])
+        return float(wait)
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+class RateLimiter:
+    """
+    Набор политик поверх backend корзин.
+
+    Если общий backend недоступен, лимиты продолжают действовать в пределах процесса:
+    запросы ограничиваются корзинами в памяти, а не отклоняются и не пропускаются все подряд.
+    """
+
+    def __init__(self, policies: dict[str, RateLimitPolicy], backend, fallback: MemoryRateLimitBackend, logger=None):
+        self.policies = policies
+        self.backend = backend
+        self.fallback = fallback
+        self.logger = logger
+        self.backend_errors = 0
+        self._backend_failing = False
+        self._stats = {name: {'allowed': 0, 'rejected': 0} for name in policies}
+
+    async def acquire(self, policy_name: str, key: str, cost: int = 1) -> float:
+        """
+        Списывает cost токенов из корзины key политики policy_name.
+        Незаданная политика или политика с rate <= 0 не ограничивает запросы.
+
+        Return:
+        - float: 0, если запрос разрешён, иначе через сколько секунд повторить.
+        """
+        policy = self.policies.get(policy_name)
+        if policy is None or policy.rate <= 0:
+            return 0.0
+
+        bucket_key = f'{policy_name}:{key}'
+        try:
+            wait = await self.backend.acquire(bucket_key, policy, cost)
+            self._backend_failing = False
+        except Exception as error:
+            self.backend_errors += 1
+            if not self._backend_failing and self.logger is not None:
+                self.logger.warning(f'Rate limit backend failed, falling back to in-process buckets: {error}')
+            self._backend_failing = True
+            wait = await self.fallback.acquire(bucket_key, policy, cost)
+
+        self._stats[policy_name]['rejected' if wait > 0 else 'allowed'] += 1
+        return wait
+
+    def stats(self) -> list[tuple[dict, dict]]:
+        return [({'policy': name}, stats) for name, stats in self._stats.items()]
+
+    async def close(self) -> None:
+        await self.backend.close()
+        await self.fallback.close()
+
+
+def create_rate_limiter(config: Config, logger=None) -> RateLimiter:
+    policies = {name: RateLimitPolicy(rate=rate, burst=burst) for name, (rate, burst) in config.RATE_LIMITS.items()}
+    fallback = MemoryRateLimitBackend(config.RATE_LIMIT_MAX_KEYS)
+    if config.RATE_LIMIT_BACKEND == 'redis':
+        backend = RedisRateLimitBackend(config.RATE_LIMIT_REDIS_URL)
+    elif config.RATE_LIMIT_BACKEND == 'memory':
+        backend = fallback
+    else:
+        raise ValueError(f'Unknown RATE_LIMIT_BACKEND: {config.RATE_LIMIT_BACKEND}')
+    return RateLimiter(policies, backend, fallback, logger)
+
+
+def client_ip(request: Request) -> str:
+    return f'ip:{request.client.host if request.client else "unknown"}'
+
+
+def global_key(request: Request) -> str:
+    return 'global'
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """
+    Зависимость, ограничивающая частоту запросов к роуту.
+
+    Подключается через dependencies=[Depends(RateLimit(...))] в декораторе роута: такие зависимости
+    выполняются раньше параметров эндпоинта, поэтому отклонённый запрос не доходит до БД и криптографии.
+
+    Parameters:
+    - policy (str): Имя политики из Config.RATE_LIMITS.
+    - key (Callable): Ключ корзины по запросу: client_ip, global_key или user_or_ip_key.
+    """
+
+    policy: str
+    key: Callable[[Request], str] = client_ip
+
+    async def __call__(self, request: Request) -> None:
+        await check_rate_limit(request, self.policy, self.key(request))
+
+
+async def check_rate_limit(request: Request, policy: str, key: str, cost: int = 1) -> None:
+    """
+    Списывает cost токенов политики policy, при нехватке отклоняет запрос с 429.
+    Для роутов, стоимость которых известна только после разбора тела (например, число заказов в пачке).
+    """
+    limiter: Optional[RateLimiter] = getattr(request.app.state, 'rate_limiter', None)
+    if limiter is None:
+        return
+    wait = await limiter.acquire(policy, key, cost)
+    if wait > 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail='Too many requests',
+            headers={'Retry-After': str(max(math.ceil(wait), 1))}
+        )
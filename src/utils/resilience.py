@@ -0,0 +1,179 @@
+import asyncio
+import time
+from collections import deque
+from typing import Optional
+
+
+class BulkheadFullError(Exception):
+    pass
+
+
+class Bulkhead:
+    """
+    Ограничение числа одновременных вызовов одного upstream-эндпоинта.
+
+    Parameters:
+    - limit (int): Сколько вызовов может выполняться одновременно.
+    - max_wait (float): Сколько секунд ждать свободного места, после чего вызов отклоняется BulkheadFullError.
+    """
+
+    def __init__(self, limit: int, max_wait: float):
+        self.limit = limit
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.rejected = 0
+
+    async def __aenter__(self) -> 'Bulkhead':
+        try:
+            if self._semaphore.locked() and self.max_wait <= 0:
+                raise asyncio.TimeoutError
+            await asyncio.wait_for(self._semaphore.acquire(), self.max_wait or None)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise BulkheadFullError(f'{self.limit} calls are already in flight')
+        self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            'limit': self.limit,
+            'in_flight': self.in_flight,
+            'rejected': self.rejected,
+        }
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker по скользящему окну последних вызовов.
+
+    Размыкается, когда в окне из не менее min_calls вызовов доля ошибок достигает failure_rate
+    или доля медленных (дольше slow_call_duration) - slow_call_rate. В разомкнутом состоянии вызовы
+    сразу отклоняются. Через open_timeout секунд пропускается half_open_calls пробных вызовов:
+    если все успешны, breaker замыкается, при первой ошибке снова размыкается.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(
+            self,
+            window: int,
+            min_calls: int,
+            failure_rate: float,
+            slow_call_duration: float,
+            slow_call_rate: float,
+            open_timeout: float,
+            half_open_calls: int,
+    ):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_duration = slow_call_duration
+        self.slow_call_rate = slow_call_rate
+        self.open_timeout = open_timeout
+        self.half_open_calls = half_open_calls
+        # (ошибка, медленный вызов)
+        self._calls: deque[tuple[bool, bool]] = deque(maxlen=window)
+        self._failures = 0
+        self._slow_calls = 0
+        self._state = self.CLOSED
+        # Увеличивается при каждой смене состояния, чтобы не учитывать вызовы, начатые в прежнем состоянии
+        self._generation = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_timeout:
+            self._set_state(self.HALF_OPEN)
+            self._probes = 0
+            self._probe_successes = 0
+        return self._state
+
+    def admit(self) -> Optional[int]:
+        """
+        Решает, можно ли выполнить вызов. В half-open занимает место пробного вызова до record.
+
+        Return:
+        - Optional[int]: Поколение состояния, в котором вызов допущен (передаётся в record), или None, если вызов отклонён.
+        """
+        state = self.state
+        if state == self.HALF_OPEN and self._probes < self.half_open_calls:
+            self._probes += 1
+            return self._generation
+        if state == self.CLOSED:
+            return self._generation
+        self.rejected += 1
+        return None
+
+    def record(self, generation: int, success: Optional[bool], duration: float) -> None:
+        """
+        Учитывает результат вызова, допущенного admit().
+        success=None - вызов прерван без результата (например, отменён), он только освобождает место.
+        """
+        if generation != self._generation:
+            return
+
+        if self._state == self.HALF_OPEN:
+            self._probes -= 1
+            if success is False:
+                self._open()
+            elif success:
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_calls:
+                    self._set_state(self.CLOSED)
+                    self._reset_window()
+            return
+
+        if success is None:
+            return
+        failed = not success
+        slow = duration >= self.slow_call_duration
+        if len(self._calls) == self._calls.maxlen:
+            old_failed, old_slow = self._calls[0]
+            self._failures -= old_failed
+            self._slow_calls -= old_slow
+        self._calls.append((failed, slow))
+        self._failures += failed
+        self._slow_calls += slow
+
+        calls = len(self._calls)
+        if calls >= self.min_calls and (
+                self._failures / calls >= self.failure_rate or self._slow_calls / calls >= self.slow_call_rate
+        ):
+            self._open()
+
+    def stats(self) -> dict:
+        calls = len(self._calls)
+        return {
+            'state': self.STATE_CODES[self.state],
+            'calls': calls,
+            'failure_rate': self._failures / calls if calls else 0.0,
+            'slow_call_rate': self._slow_calls / calls if calls else 0.0,
+            'opened': self.opened,
+            'rejected': self.rejected,
+        }
+
+    def _open(self) -> None:
+        self._set_state(self.OPEN)
+        self._opened_at = time.monotonic()
+        self.opened += 1
+        self._reset_window()
+
+    def _set_state(self, state: str) -> None:
+        self._state = state
+        self._generation += 1
+
+    def _reset_window(self) -> None:
+        self._calls.clear()
+        self._failures = 0
+        self._slow_calls = 0
@@ -0,0 +1,26 @@
+from typing import Any
+
+import orjson
+from fastapi.datastructures import Default
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON-ответ, сериализуемый через orjson: UUID, datetime и вложенные списки кодируются без jsonable_encoder.
+    Pydantic-схемы сериализуются собственным скомпилированным сериализатором Pydantic.
+
+    Для эндпоинтов без response_model ответ нужно возвращать явно (return ORJSONResponse(data)),
+    иначе FastAPI сначала прогонит результат через jsonable_encoder.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.model_dump_json().encode()
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+# Класс ответа по умолчанию для приложения. Обёртка Default сохраняет быстрый путь FastAPI
+# для эндпоинтов с response_model: такие ответы сериализуются Pydantic сразу в байты.
+default_response_class = Default(ORJSONResponse)
@@ -0,0 +1,164 @@
+"""
+Раздача статики с заранее сжатыми вариантами файлов.
+
+Сжатые варианты собираются при сборке: python -m src.utils.static [--directory static]
+Рядом с каждым текстовым файлом появляются file.gz и, если установлен пакет brotli, file.br.
+"""
+import argparse
+import gzip
+import hashlib
+import os
+from functools import lru_cache
+from mimetypes import guess_type
+from pathlib import Path
+
+from starlette.datastructures import Headers, QueryParams
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+STATIC_DIR = Path(__file__).parent.parent.parent / 'static'
+STATIC_URL = '/static'
+
+# В порядке предпочтения
+ENCODING_SUFFIXES = (('br', '.br'), ('gzip', '.gz'))
+COMPRESSIBLE_EXTENSIONS = ('.js', '.css', '.html', '.json', '.svg', '.map', '.txt')
+MIN_COMPRESS_SIZE = 1024
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles, отдающий заранее сжатые варианты файлов (file.js.br, file.js.gz) по Accept-Encoding.
+
+    У каждого варианта свой строгий ETag, условные запросы получают 304.
+    Версионированные URL (с параметром v, см. static_url) кэшируются браузером навсегда,
+    остальные - с обязательной ревалидацией по ETag.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # full_path -> (st_mtime_ns исходного файла, {encoding: (путь, stat)})
+        self._variants: dict[str, tuple[int, dict]] = {}
+
+    def file_response(
+            self,
+            full_path,
+            stat_result: os.stat_result,
+            scope: Scope,
+            status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+
+        encoding, path, variant_stat = None, full_path, stat_result
+        accepted = _accepted_encodings(request_headers.get('accept-encoding', ''))
+        variants = self._get_variants(full_path, stat_result)
+        for candidate, _ in ENCODING_SUFFIXES:
+            if candidate in accepted and candidate in variants:
+                encoding = candidate
+                path, variant_stat = variants[candidate]
+                break
+
+        headers = {
+            'etag': f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}-{encoding or "identity"}"',
+            'cache-control': IMMUTABLE_CACHE_CONTROL if 'v' in QueryParams(scope.get('query_string', b'')) else REVALIDATE_CACHE_CONTROL,
+            'vary': 'Accept-Encoding',
+        }
+        if encoding:
+            headers['content-encoding'] = encoding
+
+        response = FileResponse(
+            path,
+            status_code=status_code,
+            headers=headers,
+            media_type=guess_type(full_path)[0] or 'application/octet-stream',
+            stat_result=variant_stat,
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    def _get_variants(self, full_path: str, stat_result: os.stat_result) -> dict:
+        cached = self._variants.get(full_path)
+        if cached is not None and cached[0] == stat_result.st_mtime_ns:
+            return cached[1]
+
+        variants = {}
+        for encoding, suffix in ENCODING_SUFFIXES:
+            try:
+                variant_stat = os.stat(full_path + suffix)
+            except OSError:
+                continue
+            # Вариант, собранный раньше изменения исходного файла, устарел
+            if variant_stat.st_mtime_ns >= stat_result.st_mtime_ns:
+                variants[encoding] = (full_path + suffix, variant_stat)
+        self._variants[full_path] = (stat_result.st_mtime_ns, variants)
+        return variants
+
+
+@lru_cache
+def static_url(path: str) -> str:
+    """URL файла из static с версией по содержимому: такой URL можно кэшировать навсегда."""
+    digest = hashlib.sha256((STATIC_DIR / path).read_bytes()).hexdigest()[:12]
+    return f'{STATIC_URL}/{path}?v={digest}'
+
+
+def _accepted_encodings(header: str) -> set[str]:
+    accepted = set()
+    for item in header.split(','):
+        encoding, _, params = item.partition(';')
+        name, _, value = params.partition('=')
+        if name.strip() == 'q':
+            try:
+                if float(value) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(encoding.strip().lower())
+    return accepted
+
+
+def compress_static(directory: Path) -> list[Path]:
+    """Создаёт .gz и .br рядом с текстовыми файлами directory, если сжатие уменьшает размер."""
+    created = []
+    for path in sorted(directory.rglob('*')):
+        if not path.is_file() or path.suffix not in COMPRESSIBLE_EXTENSIONS:
+            continue
+        data = path.read_bytes()
+        if len(data) < MIN_COMPRESS_SIZE:
+            continue
+
+        compressed = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            compressed.append(('.br', brotli.compress(data, quality=11)))
+        for suffix, content in compressed:
+            if len(content) >= len(data):
+                continue
+            target = path.with_name(path.name + suffix)
+            target.write_bytes(content)
+            created.append(target)
+    return created
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--directory', type=Path, default=STATIC_DIR)
+    args = parser.parse_args()
+
+    if brotli is None:
+        print('brotli is not installed, only gzip variants will be created')
+    for path in compress_static(args.directory):
+        print(f'{path} ({path.stat().st_size} bytes)')
+
+
+if __name__ == '__main__':
+    main()
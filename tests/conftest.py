@@ -0,0 +1,68 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def _write_jwt_keys(directory: Path) -> tuple[str, str]:
+    """Временная пара ключей, чтобы Config загрузился без настоящих ключей."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_path = directory / 'jwt_private.pem'
+    public_path = directory / 'jwt_public.pem'
+    private_path.write_bytes(key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ))
+    public_path.write_bytes(key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ))
+    return str(private_path), str(public_path)
+
+
+def pytest_configure(config):
+    directory = Path(tempfile.mkdtemp(prefix='tests-'))
+    if 'JWT_PRIVATE_KEY_PATH' not in os.environ:
+        os.environ['JWT_PRIVATE_KEY_PATH'], os.environ['JWT_PUBLIC_KEY_PATH'] = _write_jwt_keys(directory)
+    for name, value in {
+        'DB_HOST': 'localhost',
+        'DB_PORT': '5432',
+        'DB_NAME': 'test',
+        'DB_USER': 'test',
+        'DB_PASS': 'test',
+        'JWT_ALGORITHM': 'RS256',
+        'ACCESS_TOKEN_EXPIRE_MINUTES': '30',
+        'REFRESH_TOKEN_EXPIRE_MINUTES': '3600',
+        'API_HOST': '127.0.0.1',
+        'API_PORT': '8000',
+        'LOG_LVL': 'info',
+        'LOGS_PATH': str(directory),
+        'LOG_NAME': 'test',
+        'TAP_BANK_BASE_URL': 'http://127.0.0.1:9999',
+        'TAP_BANK_API_TOKEN': 'test',
+    }.items():
+        os.environ.setdefault(name, value)
+
+
+class FakeClock:
+    """Подменяет time.monotonic: время идёт только через advance()."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
@@ -0,0 +1,34 @@
+import asyncio
+
+from src.utils import rate_limit
+from src.utils.rate_limit import MemoryRateLimitBackend, RateLimitPolicy
+
+
+def test_cost_is_charged_in_full(monkeypatch, clock):
+    monkeypatch.setattr(rate_limit.time, 'monotonic', clock)
+    backend = MemoryRateLimitBackend(max_keys=10)
+    policy = RateLimitPolicy(rate=10.0, burst=20)
+
+    async def scenario():
+        assert await backend.acquire('tap_bank', policy, cost=15) == 0
+        assert await backend.acquire('tap_bank', policy, cost=10) == 0.5
+        clock.advance(0.5)
+        assert await backend.acquire('tap_bank', policy, cost=10) == 0
+
+    asyncio.run(scenario())
+
+
+def test_cost_above_burst_waits_for_full_bucket_and_goes_into_debt(monkeypatch, clock):
+    monkeypatch.setattr(rate_limit.time, 'monotonic', clock)
+    backend = MemoryRateLimitBackend(max_keys=10)
+    policy = RateLimitPolicy(rate=10.0, burst=20)
+
+    async def scenario():
+        assert await backend.acquire('tap_bank', policy, cost=1) == 0
+        assert await backend.acquire('tap_bank', policy, cost=50) == 0.1
+        clock.advance(0.1)
+        assert await backend.acquire('tap_bank', policy, cost=50) == 0
+        # Долг в 30 токенов и 1 токен на следующий запрос восполняются за 3.1 секунды
+        assert round(await backend.acquire('tap_bank', policy, cost=1), 6) == 3.1
+
+    asyncio.run(scenario())
@@ -0,0 +1,198 @@
+import asyncio
+
+import pytest
+
+from src.utils import resilience
+from src.utils.resilience import Bulkhead, BulkheadFullError, CircuitBreaker
+
+
+@pytest.fixture
+def breaker(monkeypatch, clock) -> CircuitBreaker:
+    monkeypatch.setattr(resilience.time, 'monotonic', clock)
+    return CircuitBreaker(
+        window=10,
+        min_calls=4,
+        failure_rate=0.5,
+        slow_call_duration=1.0,
+        slow_call_rate=0.5,
+        open_timeout=30.0,
+        half_open_calls=2,
+    )
+
+
+def _call(breaker: CircuitBreaker, success: bool = True, duration: float = 0.1) -> None:
+    generation = breaker.admit()
+    assert generation is not None
+    breaker.record(generation, success, duration)
+
+
+def _open(breaker: CircuitBreaker) -> None:
+    for _ in range(4):
+        _call(breaker, success=False)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_stays_closed_until_min_calls(breaker):
+    for _ in range(3):
+        _call(breaker, success=False)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    _call(breaker, success=False)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opened == 1
+
+
+def test_opens_on_failure_rate(breaker):
+    _call(breaker)
+    _call(breaker)
+    _call(breaker, success=False)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    _call(breaker, success=False)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_opens_on_slow_call_rate(breaker):
+    _call(breaker, duration=0.1)
+    _call(breaker, duration=0.1)
+    _call(breaker, duration=1.0)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    _call(breaker, duration=5.0)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_old_calls_leave_the_window(breaker):
+    for success in (True, True, True, False, False):
+        _call(breaker, success=success)
+    for _ in range(10):
+        _call(breaker)
+    assert breaker.stats()['failure_rate'] == 0.0
+
+    # Прежние ошибки вытеснены из окна: 4 из 10 - ниже порога, 5 из 10 - размыкание
+    for _ in range(4):
+        _call(breaker, success=False)
+    assert breaker.state == CircuitBreaker.CLOSED
+    _call(breaker, success=False)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_open_rejects_until_timeout(breaker, clock):
+    _open(breaker)
+    assert breaker.admit() is None
+    assert breaker.rejected == 1
+
+    clock.advance(29.9)
+    assert breaker.admit() is None
+
+    clock.advance(0.1)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_half_open_limits_probes_and_closes_after_successes(breaker, clock):
+    _open(breaker)
+    clock.advance(30.0)
+
+    first = breaker.admit()
+    second = breaker.admit()
+    assert first is not None and second is not None
+    assert breaker.admit() is None
+
+    breaker.record(first, True, 0.1)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record(second, True, 0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats()['calls'] == 0
+
+
+def test_half_open_failure_reopens(breaker, clock):
+    _open(breaker)
+    clock.advance(30.0)
+
+    generation = breaker.admit()
+    breaker.record(generation, False, 0.1)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opened == 2
+
+    clock.advance(29.0)
+    assert breaker.admit() is None
+
+
+def test_cancelled_probe_frees_its_slot(breaker, clock):
+    _open(breaker)
+    clock.advance(30.0)
+
+    first = breaker.admit()
+    breaker.admit()
+    breaker.record(first, None, 0.1)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.admit() is not None
+
+
+def test_result_from_previous_state_is_ignored(breaker, clock):
+    stale = breaker.admit()
+    _open(breaker)
+    clock.advance(30.0)
+    probe = breaker.admit()
+
+    # Вызов, начатый до размыкания, не закрывает и не размыкает breaker в half-open
+    breaker.record(stale, False, 0.1)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    breaker.record(probe, True, 0.1)
+    assert breaker.admit() is not None
+
+
+def test_bulkhead_rejects_immediately_without_wait():
+    async def scenario():
+        bulkhead = Bulkhead(limit=2, max_wait=0)
+        async with bulkhead:
+            async with bulkhead:
+                assert bulkhead.in_flight == 2
+                with pytest.raises(BulkheadFullError):
+                    async with bulkhead:
+                        pass
+        return bulkhead
+
+    bulkhead = asyncio.run(scenario())
+    assert bulkhead.stats() == {'limit': 2, 'in_flight': 0, 'rejected': 1}
+
+
+def test_bulkhead_waits_for_a_free_slot():
+    async def scenario():
+        bulkhead = Bulkhead(limit=1, max_wait=1.0)
+        release = asyncio.Event()
+
+        async def hold():
+            async with bulkhead:
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(bulkhead.__aenter__())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+
+        release.set()
+        await holder
+        await waiter
+        assert bulkhead.in_flight == 1
+        await bulkhead.__aexit__(None, None, None)
+        return bulkhead
+
+    bulkhead = asyncio.run(scenario())
+    assert bulkhead.stats() == {'limit': 1, 'in_flight': 0, 'rejected': 0}
+
+
+def test_bulkhead_rejects_after_max_wait():
+    async def scenario():
+        bulkhead = Bulkhead(limit=1, max_wait=0.01)
+        async with bulkhead:
+            with pytest.raises(BulkheadFullError):
+                async with bulkhead:
+                    pass
+        return bulkhead
+
+    bulkhead = asyncio.run(scenario())
+    assert bulkhead.rejected == 1
+    assert bulkhead.in_flight == 0
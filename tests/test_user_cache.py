@@ -0,0 +1,65 @@
+import asyncio
+from uuid import uuid4
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+
+from src.users.cache import cache_user, invalidate_user, recently_invalidated_users, user_cache
+from src.users.models import User
+from src.users.repositories import UserRepository
+from src.users.service import UserService
+
+
+async def _create_user(session_maker) -> User:
+    async with session_maker() as session:
+        user = User(
+            username='cached',
+            hashed_password='x',
+            first_name='First',
+            last_name='Last',
+            phone='+70000000000',
+            email='cached@example.com',
+        )
+        session.add(user)
+        await session.commit()
+        return user
+
+
+def test_cached_user_survives_rollback_of_loading_session():
+    async def scenario():
+        engine = create_async_engine('sqlite+aiosqlite://')
+        async with engine.begin() as connection:
+            await connection.run_sync(User.__table__.create)
+        session_maker = async_sessionmaker(engine, expire_on_commit=False)
+        user_id = (await _create_user(session_maker)).id
+        user_cache.clear()
+
+        # Запрос загружает пользователя в кэш, затем его транзакция откатывается
+        async with session_maker() as session:
+            loaded = await UserService(UserRepository(session)).get_one_cached(user_id)
+            await session.rollback()
+
+        # Следующий запрос получает тот же экземпляр из кэша со всеми атрибутами
+        async with session_maker() as session:
+            cached = await UserService(UserRepository(session)).get_one_cached(user_id)
+        await engine.dispose()
+        return loaded, cached
+
+    loaded, cached = asyncio.run(scenario())
+    assert cached is loaded
+    assert cached.is_superuser is False
+    assert cached.username == 'cached'
+
+
+def test_recently_invalidated_user_is_not_cached():
+    user = User(id=uuid4(), username='changed')
+    user_cache.clear()
+
+    # Чтение, начатое до изменения, не должно вернуть старую строку в кэш
+    invalidate_user(Session(), user.id)
+    cache_user(user)
+    assert user_cache.peek(str(user.id)) is None
+
+    recently_invalidated_users.clear()
+    cache_user(user)
+    assert user_cache.peek(str(user.id)) is user